@@ -0,0 +1,129 @@
+"""Synthetic CHIRPS / IDEAM inputs and a local HTTP server to feed them to the services."""
+import datetime
+import functools
+import os
+import threading
+import zipfile
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from shared import datetime_utils, folder_utils, geo_index, geo_utils
+from shared.constants_application import CoordinateColumns, FormatDates
+
+CHIRPS_FILES_NAME = "data.{}.tif"
+IDEAM_PREFIX_FILE = "geoTIFFprechorario"
+IDEAM_EXTENSION_FILE = "00Z.zip"
+NODATA = -9999.0
+
+
+class GridSpec:
+    def __init__(self, name: str, nrows: int, ncols: int, xll: float, yll: float, clsz: float):
+        self.name = name
+        self.nrows = nrows
+        self.ncols = ncols
+        self.xll = xll
+        self.yll = yll
+        self.clsz = clsz
+
+    @property
+    def georef(self) -> tuple:
+        return self.xll, self.clsz, 0.0, self.yll + self.nrows * self.clsz, 0.0, -self.clsz
+
+
+GRIDS = {
+    "small": GridSpec("small", 200, 300, -80.0, -5.0, 0.05),
+    # IDEAM hourly WRF domain over Colombia: 249 columns, as IdeamService's cell numbers (23749, 38214) imply;
+    # the rows cover the country at the same spacing
+    "ideam": GridSpec("ideam", 320, 249, -79.9, -4.3, 0.0555),
+    # CHIRPS-GEFS global 0.05 degree grid, 50S - 50N
+    "chirps": GridSpec("chirps", 2000, 7200, -180.0, -50.0, 0.05)
+}
+
+
+def synthetic_matrix(grid: GridSpec, seed: int, nodata_fraction: float = 0.01) -> np.ndarray:
+    generator = np.random.default_rng(seed)
+    mtrx = generator.gamma(0.5, 8.0, size=(grid.nrows, grid.ncols)).astype(np.float32)
+    mtrx[generator.random(mtrx.shape) < nodata_fraction] = NODATA
+    return mtrx
+
+
+def write_synthetic_raster(path: str, grid: GridSpec, seed: int = 0) -> str:
+    rst = geo_utils.build_raster(grid.xll, grid.yll, grid.clsz, NODATA, synthetic_matrix(grid, seed))
+    geo_utils.write_raster(path, rst)
+    return path
+
+
+def write_chirps_files(root: str, grid: GridSpec, issue_date: datetime, amount: int = 16) -> str:
+    """Writes the files the CHIRPS service downloads for issue_date under root; returns their folder."""
+    folder = folder_utils.join_path(
+        root, datetime_utils.get_str_date_formatted(issue_date, FormatDates.YEAR_MONTH_DAY_SLASH))
+    folder_utils.create_folder_with_subfolders(folder)
+    for day in range(amount):
+        date = datetime_utils.add_days_to_date(issue_date, day)
+        name = CHIRPS_FILES_NAME.format(datetime_utils.get_str_date_formatted(date, FormatDates.YEAR_POINT_MONTH_DAY))
+        write_synthetic_raster(folder_utils.join_path(folder, name), grid, day)
+    return folder
+
+
+def write_ideam_zip(root: str, grid: GridSpec, issue_date: datetime, days: int = 3) -> str:
+    """Writes the hourly IDEAM zip for issue_date, with members named ...DIA<day><hour>HLC.tif."""
+    folder_utils.create_folder_with_subfolders(root)
+    zip_name = IDEAM_PREFIX_FILE + datetime_utils.get_str_date_formatted(
+        issue_date, FormatDates.DAY_MONTH_YEAR) + IDEAM_EXTENSION_FILE
+    zip_path = folder_utils.join_path(root, zip_name)
+    member_path = folder_utils.join_path(root, "member.tif")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for day in range(1, days + 1):
+            for hour in range(24):
+                write_synthetic_raster(member_path, grid, day * 24 + hour)
+                zip_file.write(member_path, f"prec_DIA{day}{hour:02d}HLC.tif")
+    folder_utils.delete_file(member_path)
+    return zip_path
+
+
+def write_points(path: str, grid: GridSpec, count: int, id_column: str, seed: int = 0) -> pd.DataFrame:
+    """Writes count random cell centres of the grid as a coordinates CSV."""
+    generator = np.random.default_rng(seed)
+    rows = generator.integers(0, grid.nrows, count)
+    cols = generator.integers(0, grid.ncols, count)
+    georef = grid.georef
+    points = pd.DataFrame({
+        id_column: np.arange(1, count + 1),
+        CoordinateColumns.X.value: georef[0] + (cols + 0.5) * georef[1],
+        CoordinateColumns.Y.value: georef[3] + (rows + 0.5) * georef[5]
+    })
+    points.to_csv(path, index=False)
+    return points
+
+
+def write_ideam_index(coordinates_path: str, grid: GridSpec, count: int) -> None:
+    """
+    IDEAM reads its points from an Excel sheet; the persisted geo index built here matches the synthetic grid, so
+    the service reuses it instead of opening the workbook.
+    """
+    points = write_points(coordinates_path, grid, count, "COD")
+    index = geo_index.build_geo_index(
+        points.COD, points[CoordinateColumns.X.value], points[CoordinateColumns.Y.value], grid.georef,
+        (grid.nrows, grid.ncols), os.path.getmtime(coordinates_path))
+    index.save(geo_index.get_index_path(coordinates_path))
+
+
+class __QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve(folder: str):
+    """Serves folder over HTTP on a free local port and yields its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(__QuietHandler, directory=folder))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
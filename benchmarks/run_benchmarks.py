@@ -0,0 +1,202 @@
+"""
+Reproducible benchmarks of the ingest pipeline on synthetic data.
+
+    python -m benchmarks.run_benchmarks --sizes small,ideam --workers 1,4 --baseline benchmarks/baseline.json
+
+The results are compared with the baseline and the run fails when a benchmark is slower than the baseline by more
+than --tolerance; --update rewrites the baseline with the new results.
+"""
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import fixtures
+from infrastructure.data_source_service.chirps_service import ChirpsService
+from infrastructure.data_source_service.ideam_service import IdeamService
+from infrastructure.model_config.data_source_config_model import ChirpsConfig, IdeamConfig
+from infrastructure.model_config.project_config import ProjectConfig
+from shared import datetime_utils, disaggregation, folder_utils, geo_utils
+from shared.constants_application import AggregationColumns
+
+POINTS = 2000
+STATIONS = 200
+COLD_START = """
+import time, tracemalloc
+start = time.perf_counter()
+{trace}
+import hydrosed.start_up as start_up
+start_up.wire_modules()
+print(time.perf_counter() - start, tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0)
+"""
+
+
+class BenchmarkModelConfig:
+    """Stands in for ModelConfigService, pointing the services to the synthetic data and the local server."""
+
+    def __init__(self, root: str, server_url: str, workers: int):
+        self.root = root
+        self.server_url = server_url
+        self.workers = workers
+
+    def get_project_config(self) -> ProjectConfig:
+        return ProjectConfig([], None, None, None, folder_utils.join_path(self.root, "log"))
+
+    def on_change(self, callback) -> None:
+        """The benchmark configuration never changes."""
+
+    def get_config_chirps(self) -> ChirpsConfig:
+        output_path = folder_utils.join_path(self.root, "chirps_output")
+        folder_utils.create_folder_with_subfolders(output_path)
+        return ChirpsConfig(
+            fixtures.CHIRPS_FILES_NAME, self.server_url + "chirps/", output_path,
+            folder_utils.join_path(self.root, "stations.csv"), folder_utils.join_path(self.root, "chirps_points.csv"),
+            folder_utils.join_path(self.root, "basins.csv"), download_workers=self.workers, processes=self.workers,
+            metadata_cache_path=folder_utils.join_path(self.root, "metadata"))
+
+    def get_config_ideam(self) -> IdeamConfig:
+        output_path = folder_utils.join_path(self.root, "ideam_output")
+        folder_utils.create_folder_with_subfolders(output_path)
+        return IdeamConfig(
+            "", self.server_url + "ideam/", output_path, folder_utils.join_path(self.root, "ideam_points.csv"),
+            download_workers=self.workers, processes=self.workers,
+            metadata_cache_path=folder_utils.join_path(self.root, "metadata"))
+
+
+def measure(function, repeat: int, setup=None) -> dict:
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "runs": repeat}
+
+
+def prepare_data(root: str, grid: fixtures.GridSpec, issue_date) -> str:
+    data_path = folder_utils.join_path(root, "www")
+    fixtures.write_chirps_files(folder_utils.join_path(data_path, "chirps"), grid, issue_date)
+    fixtures.write_ideam_zip(folder_utils.join_path(data_path, "ideam"), grid, issue_date)
+    fixtures.write_points(folder_utils.join_path(root, "chirps_points.csv"), grid, POINTS, "POINTID")
+    fixtures.write_points(
+        folder_utils.join_path(root, "stations.csv"), grid, STATIONS, AggregationColumns.STATION.value, 1)
+    fixtures.write_ideam_index(folder_utils.join_path(root, "ideam_points.csv"), grid, POINTS)
+    return data_path
+
+
+def bench_rasters(results: dict, root: str, grid: fixtures.GridSpec, repeat: int) -> None:
+    tif_path = fixtures.write_synthetic_raster(folder_utils.join_path(root, "raster.tif"), grid)
+    asc_path = folder_utils.join_path(root, "raster.asc")
+    rst = geo_utils.read_raster(tif_path)
+    results[f"read_raster[{grid.name}]"] = measure(lambda: geo_utils.read_raster(tif_path), repeat)
+    results[f"write_ascii_raster[{grid.name}]"] = measure(lambda: geo_utils.write_ascii_raster(asc_path, rst), repeat)
+    geo_utils.close_datasets()
+
+
+def bench_resampling(results: dict, grid: fixtures.GridSpec, repeat: int, days: int = 16) -> None:
+    dates = pd.date_range("2024-01-01", periods=days, freq="D")
+    offsets = np.random.default_rng(0).integers(0, grid.nrows * grid.ncols, POINTS)
+    layers = [fixtures.synthetic_matrix(grid, day) for day in range(days)]
+
+    def resample():
+        cube = geo_utils.RasterCube(dates, grid.nrows, grid.ncols, grid.georef)
+        for position, layer in enumerate(layers):
+            cube.fill(position, layer)
+        cube.mask_nodata()
+        disaggregation.disaggregate(cube.take_points(offsets), cube.dates, disaggregation.UniformProfile())
+
+    results[f"resampling[{grid.name}]"] = measure(resample, repeat)
+
+
+def bench_services(results: dict, root: str, data_path: str, grid: fixtures.GridSpec, workers: int,
+                   repeat: int) -> None:
+    with fixtures.serve(data_path) as server_url:
+        model_config = BenchmarkModelConfig(root, server_url, workers)
+        for name, service in [("chirps", ChirpsService(model_config)), ("ideam", IdeamService(model_config))]:
+            get_data, process_data = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                service.get_data()
+                get_data.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                service.process_data()
+                process_data.append(time.perf_counter() - start)
+            for stage, timings in [("get_data", get_data), ("process_data", process_data)]:
+                results[f"{name}.{stage}[{grid.name},workers={workers}]"] = {
+                    "median": statistics.median(timings), "min": min(timings), "runs": repeat}
+
+
+def bench_cold_start(results: dict, repeat: int) -> None:
+    """Time and peak traced memory of importing and wiring main.py's application, each in a fresh interpreter."""
+    def run(trace: bool):
+        code = COLD_START.format(trace="tracemalloc.start()" if trace else "")
+        output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+        return [float(value) for value in output.split()]
+
+    timings = [run(False)[0] for _ in range(repeat)]
+    results["cold_start"] = {"median": statistics.median(timings), "min": min(timings), "runs": repeat,
+                             "peak_memory_bytes": run(True)[1]}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["median"] > reference["median"] * (1 + tolerance):
+            regressions.append(f"{name}: {result['median']:.3f} s vs {reference['median']:.3f} s")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="small,ideam", help=f"comma separated, among {', '.join(fixtures.GRIDS)}")
+    parser.add_argument("--workers", default="1,4", help="comma separated download / decode worker counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown over the baseline")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--skip-services", action="store_true", help="only run the raster benchmarks")
+    args = parser.parse_args(argv)
+
+    issue_date = datetime_utils.get_current_day()
+    results = {}
+    bench_cold_start(results, args.repeat)
+    for size in args.sizes.split(","):
+        grid = fixtures.GRIDS[size]
+        with tempfile.TemporaryDirectory() as root:
+            bench_rasters(results, root, grid, args.repeat)
+            bench_resampling(results, grid, args.repeat)
+            if not args.skip_services:
+                data_path = prepare_data(root, grid, issue_date)
+                for workers in [int(value) for value in args.workers.split(",")]:
+                    bench_services(results, root, data_path, grid, workers, args.repeat)
+
+    for name, result in results.items():
+        print(f"{name:55s} {result['median']:9.3f} s (min {result['min']:.3f} s)")
+
+    report = {"created": datetime.datetime.now().isoformat(), "python": platform.python_version(),
+              "platform": platform.platform(), "results": results}
+    if args.update or not folder_utils.exist_folder(args.baseline):
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as file:
+        regressions = compare(results, json.load(file)["results"], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import functools
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from shared import menssage, metrics
+
+if TYPE_CHECKING:
+    from infrastructure.data_source_service.data_source_service import ExternalDataSourceService, \
+        SharedDownloadLoop
+
+
+class StageTimeoutError(TimeoutError):
+    pass
+
+
+class Stage:
+    def __init__(self, name: str, action, depends_on: list[str] = None, timeout: float = None):
+        self.name = name
+        self.action = action
+        self.depends_on = depends_on or []
+        self.timeout = timeout
+
+
+class StageResult:
+    def __init__(self, name: str, elapsed: float = 0.0, error: Exception = None, skipped: bool = False):
+        self.name = name
+        self.elapsed = elapsed
+        self.error = error
+        self.skipped = skipped
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and not self.skipped
+
+
+class Orchestrator:
+    """
+    Runs a dependency graph of stages, each in its own thread as soon as the stages it depends on succeed, so the
+    downloads of one source overlap with the processing of another. A stage that exceeds its timeout is abandoned
+    and every stage that depends on it is skipped.
+    """
+
+    def __init__(self):
+        self.__stages: dict[str, Stage] = {}
+
+    def add_stage(self, name: str, action, depends_on: list[str] = None, timeout: float = None) -> None:
+        for dependency in depends_on or []:
+            if dependency not in self.__stages:
+                raise ValueError(f"Stage {name} depends on the unknown stage {dependency}")
+        self.__stages[name] = Stage(name, action, depends_on, timeout)
+
+    def add_source(self, name: str, service: 'ExternalDataSourceService', timeout: float = None,
+                   downloads: 'SharedDownloadLoop' = None) -> None:
+        """
+        Adds the get_data -> process_data stages of a source; processing also waits for the already added sources
+        it uses. Sources with async downloads fetch through the shared downloads loop when one is given.
+        """
+        depends_on = [f"{name}.get_data"] + [f"{source}.process_data" for source in service.depends_on_sources
+                                             if f"{source}.process_data" in self.__stages]
+        get_data = service.get_data
+        if downloads is not None and service.async_downloads:
+            get_data = functools.partial(downloads.get_data, service)
+        self.add_stage(f"{name}.get_data", get_data, timeout=timeout)
+        self.add_stage(f"{name}.process_data", service.process_data, depends_on, timeout)
+
+    def run(self) -> list[StageResult]:
+        results: dict[str, StageResult] = {}
+        started: dict[str, float] = {}
+        finished = queue.Queue()
+
+        while len(results) < len(self.__stages):
+            for stage in self.__stages.values():
+                if stage.name in results or stage.name in started:
+                    continue
+                if any(dependency in results and not results[dependency].succeeded
+                       for dependency in stage.depends_on):
+                    results[stage.name] = StageResult(stage.name, skipped=True)
+                    menssage.warning(f"Etapa {stage.name} omitida por una dependencia fallida")
+                elif all(dependency in results for dependency in stage.depends_on):
+                    started[stage.name] = time.perf_counter()
+                    threading.Thread(target=self.__run_stage, args=(stage, finished), daemon=True).start()
+            if len(results) == len(self.__stages):
+                break
+
+            try:
+                name, error = finished.get(timeout=self.__next_timeout(started, results))
+                if name not in results:
+                    results[name] = StageResult(name, time.perf_counter() - started[name], error)
+            except queue.Empty:
+                pass
+            self.__expire_stages(started, results)
+
+        for result in results.values():
+            metrics.observe("stage_seconds", result.elapsed, stage=result.name)
+            metrics.increment("stages_total", stage=result.name,
+                              status="skipped" if result.skipped else "ok" if result.succeeded else "error")
+        return [results[name] for name in self.__stages]
+
+    @staticmethod
+    def __run_stage(stage: Stage, finished: queue.Queue) -> None:
+        try:
+            with metrics.profile_thread():
+                stage.action()
+            finished.put((stage.name, None))
+        except Exception as error:
+            finished.put((stage.name, error))
+
+    def __next_timeout(self, started: dict[str, float], results: dict[str, StageResult]):
+        remaining = [started[name] + self.__stages[name].timeout - time.perf_counter()
+                     for name in started if name not in results and self.__stages[name].timeout]
+        return max(0.0, min(remaining)) if remaining else None
+
+    def __expire_stages(self, started: dict[str, float], results: dict[str, StageResult]) -> None:
+        now = time.perf_counter()
+        for name, start in started.items():
+            timeout = self.__stages[name].timeout
+            if name not in results and timeout and now - start >= timeout:
+                results[name] = StageResult(name, now - start, StageTimeoutError(f"{name} excedio {timeout} s"))
+
+
+def report(results: list[StageResult], elapsed: float) -> None:
+    for result in results:
+        fields = {"stage": result.name, "elapsed": round(result.elapsed, 3)}
+        if result.skipped:
+            menssage.warning(f"{result.name}: omitida", status="skipped", **fields)
+        elif result.succeeded:
+            menssage.success(f"{result.name}: {result.elapsed:.2f} s", status="succeeded", **fields)
+        else:
+            menssage.error(f"{result.name}: fallo en {result.elapsed:.2f} s ({result.error})", status="failed",
+                           error=repr(result.error), **fields)
+    stages_elapsed = sum(r.elapsed for r in results)
+    menssage.info(f"Tiempo total {elapsed:.2f} s, suma de etapas {stages_elapsed:.2f} s",
+                  elapsed=round(elapsed, 3), stages_elapsed=round(stages_elapsed, 3))
@@ -1,10 +1,16 @@
+import contextlib
 import sys
+import time
 
-from dependency_injector.wiring import Provide, inject
+from dependency_injector.wiring import Provide, Provider, inject
 
+from hydrosed.orchestrator import Orchestrator, report
 from infrastructure.container import Container
-from infrastructure.data_source_service.data_source_service import ExternalDataSourceService
-from shared import menssage
+from infrastructure.model_config.model_config_service import ModelConfigService
+from shared import metrics
+from shared.log import Log
+
+SOURCES = ["ideam", "chirps"]
 
 
 def wire_modules():
@@ -13,11 +19,49 @@ def wire_modules():
 
 
 @inject
-def run_app(chirps_service: ExternalDataSourceService = Provide[Container.chirps_service]):
-    menssage.info("Inicio descarga datos")
-    chirps_service.get_data()
-    menssage.success("Finalizacion descarga datos")
-
-    menssage.info("Inicio procesamiento de datos")
-    chirps_service.process_data()
-    menssage.success("Finalizacion procesamiento de datos")
+def run_app(
+    sources: list[str] = None,
+    distributed: bool = False,
+    chirps_provider=Provider[Container.chirps_service],
+    ideam_provider=Provider[Container.ideam_service],
+    model_config: ModelConfigService = Provide[Container.model_config],
+    log: Log = Provide[Container.log_service]
+):
+    """
+    Runs the given sources, all of them by default; only the selected services are built and imported. With
+    distributed, the run is sent to the Celery workers instead, or run eagerly with the memory:// broker.
+    """
+    providers = {"chirps": chirps_provider, "ideam": ideam_provider}
+    sources = [source for source in SOURCES if source in (sources or SOURCES)]
+    if distributed:
+        from hydrosed import tasks
+        result = tasks.build_pipeline(sources).apply_async()
+        log.info("Fuentes enviadas a Celery", sources=sources, task_id=result.id)
+        return
+    project_config = model_config.get_project_config()
+    metrics_path = project_config.metrics_path or project_config.logPath
+    services = {source: providers[source]() for source in sources}
+    for service in services.values():
+        service.set_issue_date()
+
+    log.info("Inicio descarga y procesamiento de datos", sources=sources)
+    start = time.perf_counter()
+    with __create_download_loop(services.values()) as downloads, \
+            metrics.profile(metrics_path, project_config.profile, project_config.trace_memory):
+        orchestrator = Orchestrator()
+        for source, service in services.items():
+            orchestrator.add_source(source, service, service.stage_timeout, downloads)
+        results = orchestrator.run()
+    elapsed = time.perf_counter() - start
+    report(results, elapsed)
+    if project_config.metrics_path:
+        metrics.registry.write(project_config.metrics_path)
+    log.success("Finalizacion descarga y procesamiento de datos", sources=sources, elapsed=round(elapsed, 3))
+
+
+def __create_download_loop(services):
+    """Shared event loop and HTTP client for the sources with async downloads; nothing is started without them."""
+    if not any(service.async_downloads for service in services):
+        return contextlib.nullcontext()
+    from infrastructure.data_source_service.data_source_service import SharedDownloadLoop
+    return SharedDownloadLoop()
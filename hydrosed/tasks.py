@@ -0,0 +1,109 @@
+"""
+Celery tasks that spread the ingest of every source over several workers. Workers must see the same data folders,
+since the per-file decode tasks read the rasters downloaded by get_data. Start them with
+``celery -A hydrosed.tasks worker``, and send a run with ``python main.py --celery``. With the default memory://
+broker every task runs eagerly in-process.
+
+Tasks only exchange JSON: the issue date travels through every chain as an ISO string, so a worker started on
+another day still reads the folder of the run, and decoded windows are sent as nested lists.
+"""
+import datetime
+
+import numpy as np
+from celery import Celery, chain, chord, group
+
+from infrastructure.container import Container
+from infrastructure.data_source_service.data_source_service import ExternalDataSourceService
+from shared import datetime_utils, geo_utils
+
+app = Celery("hydrosed")
+__container: Container = None
+
+
+def get_container() -> Container:
+    global __container
+    if __container is None:
+        __container = Container()
+    return __container
+
+
+def __get_service(source: str, issue_date: str) -> ExternalDataSourceService:
+    services = {
+        "chirps": get_container().chirps_service,
+        "ideam": get_container().ideam_service
+    }
+    service = services[source]()
+    service.set_issue_date(datetime.date.fromisoformat(issue_date))
+    return service
+
+
+def __load_settings() -> dict:
+    project_config = get_container().model_config().get_project_config()
+    eager = project_config.celery_broker.startswith("memory://")
+    return {
+        "broker_url": project_config.celery_broker,
+        "result_backend": project_config.celery_backend,
+        "task_always_eager": eager,
+        "task_eager_propagates": eager
+    }
+
+
+app.add_defaults(__load_settings)
+
+
+@app.task(name="hydrosed.get_data")
+def get_data(source: str, issue_date: str) -> str:
+    __get_service(source, issue_date).get_data()
+    return source
+
+
+@app.task(name="hydrosed.process_data")
+def process_data(source: str, issue_date: str) -> str:
+    __get_service(source, issue_date).process_data()
+    return source
+
+
+@app.task(name="hydrosed.ingest")
+def ingest(source: str, issue_date: str) -> str:
+    """Downloads and processes a source in a single task, needed when it keeps its files in memory."""
+    service = __get_service(source, issue_date)
+    service.get_data()
+    service.process_data()
+    return source
+
+
+@app.task(name="hydrosed.decode_raster")
+def decode_raster(path: str, window: list) -> list:
+    return geo_utils.read_window_matrix(path, tuple(window)).tolist()
+
+
+@app.task(name="hydrosed.assemble")
+def assemble(matrices: list, source: str, issue_date: str) -> str:
+    """Rebuilds the decode jobs of the run, which are not sent through the broker, and finishes processing."""
+    service = __get_service(source, issue_date)
+    service.process_matrices(service.get_decode_jobs(), [np.asarray(mtrx, dtype=np.float32) for mtrx in matrices])
+    return source
+
+
+@app.task(name="hydrosed.distribute_process_data")
+def distribute_process_data(source: str, issue_date: str) -> str:
+    """Decodes every file in its own task and reassembles them, in date order, with a chord."""
+    service = __get_service(source, issue_date)
+    jobs = service.get_decode_jobs()
+    if not jobs:
+        service.process_data()
+        return source
+    chord(decode_raster.si(path, window) for _, path, window in jobs)(assemble.s(source, issue_date))
+    return source
+
+
+def build_pipeline(sources: list[str], issue_date: datetime.date = None):
+    """Group with one download -> distributed processing chain per source, all for the same issue date."""
+    issue_date = (issue_date or datetime_utils.get_current_day()).isoformat()
+    signatures = []
+    for source in sources:
+        if __get_service(source, issue_date).in_memory:
+            signatures.append(ingest.si(source, issue_date))
+        else:
+            signatures.append(chain(get_data.si(source, issue_date), distribute_process_data.si(source, issue_date)))
+    return group(signatures)
@@ -1,12 +1,21 @@
 from dependency_injector import containers, providers
 
-from infrastructure.data_source_service.chirps_service import ChirpsService
-from infrastructure.data_source_service.ideam_service import IdeamService
 from infrastructure.model_config.model_config_service import ModelConfigService
 from infrastructure.model_config.path_constants import ProjectPathConstants
 from shared.log import Log
 
 
+def create_chirps_service(model_config: ModelConfigService):
+    # Imported on first use, so a run that does not need CHIRPS never loads GDAL, pandas or scipy for it
+    from infrastructure.data_source_service.chirps_service import ChirpsService
+    return ChirpsService(model_config)
+
+
+def create_ideam_service(model_config: ModelConfigService):
+    from infrastructure.data_source_service.ideam_service import IdeamService
+    return IdeamService(model_config)
+
+
 class Container(containers.DeclarativeContainer):
     project_path_constants = providers.Singleton(ProjectPathConstants)
 
@@ -15,7 +24,7 @@ class Container(containers.DeclarativeContainer):
         project_path_constants
     )
     chirps_service = providers.Singleton(
-        ChirpsService,
+        create_chirps_service,
         model_config
     )
     log_service = providers.Singleton(
@@ -23,7 +32,6 @@ class Container(containers.DeclarativeContainer):
         model_config
     )
     ideam_service = providers.Singleton(
-        IdeamService,
+        create_ideam_service,
         model_config
     )
-
@@ -1,17 +1,29 @@
+import asyncio
 import datetime
+import functools
 import math
+import threading
 import pandas
-import requests
 from dependency_injector.wiring import inject
 from pandas import DataFrame
 
+from infrastructure.data_source_service import forecast_archive, forecast_writer
 from infrastructure.data_source_service.data_source_service import ExternalDataSourceService
 from infrastructure.model_config.data_source_config_model import ChirpsConfig
 from infrastructure.model_config.model_config_service import ModelConfigService
-from shared.constants_application import FileOpeningModes, FormatDates, Granularity
+from shared.constants_application import AggregationColumns, FormatDates, HourlyProfiles
 from shared import datetime_utils
+from shared import disaggregation
+from shared import download_cache
 from shared import folder_utils
+from shared import geo_index
 from shared import geo_utils
+from shared import http_utils
+from shared import menssage
+from shared import metadata_store
+from shared import metrics
+from shared import parallel_utils
+from shared import spatial_aggregation
 
 
 class ChirpsService(ExternalDataSourceService):
@@ -19,79 +31,320 @@ class ChirpsService(ExternalDataSourceService):
     __forecast_at_gauges = None
     __basins_precipitation = None
     __amount_file = 16
-    __ideal_size = 1024
     __top_cell = 6158060
     __lower_cell = 6906903
-    __daily_distribution = 1/24
-    granularity = Granularity.ONE_HOUR.value
+    __geo_index: geo_index.GeoIndex = None
+    __cube: geo_utils.RasterCube = None
+    __streamed_index: geo_index.GeoIndex = None
+    __streamed_dates: list = []
+    __decode_errors: list = []
+    __gauge_aggregator: spatial_aggregation.SpatialAggregator = None
+    __basin_aggregator: spatial_aggregation.SpatialAggregator = None
+    __coordinates: DataFrame = None
 
     @inject
     def __init__(self, model_config: ModelConfigService):
-        self.__chirps_config: ChirpsConfig = model_config.get_config_chirps()
-        self.__projects = eval(model_config.get_project_config().projects)
-        self.__folder_path = self.__generate_folder_path()
-        self.__coordinates = pandas.read_csv(self.__chirps_config.coordinates_path)
-        self.__stations_coordinates = pandas.read_csv(self.__chirps_config.stations_coordinates_path)
+        self.__model_config = model_config
+        self.__lock = threading.Lock()
+        self.__apply_config(self.__chirps_config)
+        model_config.on_change(self.__on_config_change)
+        self.set_issue_date()
+
+    @property
+    def __chirps_config(self) -> ChirpsConfig:
+        # Read through the service, so an edited configuration file is picked up by a long running process. Each
+        # run reads it once and passes that snapshot down, so a reload never lands in the middle of a run
+        return self.__model_config.get_config_chirps()
+
+    def __on_config_change(self, path: str) -> None:
+        if path == self.__model_config.project_path_constants.path_chirps_config:
+            self.__apply_config(self.__chirps_config)
+
+    def __apply_config(self, chirps_config: ChirpsConfig) -> None:
+        self.__cache = download_cache.create_download_cache(chirps_config)
+        self.__metadata_store = metadata_store.create_metadata_store(chirps_config)
+        self.forecast_writer = forecast_writer.create_forecast_writer(
+            chirps_config.output_format, chirps_config.compression)
+        self.forecast_archive = forecast_archive.create_forecast_archive(chirps_config)
+        self.stage_timeout = chirps_config.stage_timeout
+        self.in_memory = chirps_config.streaming
+        self.async_downloads = chirps_config.async_downloads
+        self.depends_on_sources = ["ideam"] if chirps_config.hourly_profile == HourlyProfiles.IDEAM.value else []
+        self.__coordinates = None
+        self.__geo_index = None
+        self.__gauge_aggregator = None
+        self.__basin_aggregator = None
 
     # region GetData
     def get_data(self):
-        folder_utils.create_folder(self.__folder_path)
-        self.__download_data()
+        chirps_config = self.__chirps_config
+        if self.async_downloads:
+            asyncio.run(self.__get_data_async(chirps_config))
+            return
+        if chirps_config.streaming:
+            self.__stream_data(chirps_config)
+            return
+        folder_utils.create_folder(self.__get_folder_path(chirps_config))
+        self.__write_files(chirps_config, self.__generate_jobs(chirps_config))
+
+    async def get_data_async(self, session=None):
+        await self.__get_data_async(self.__chirps_config, session)
+
+    async def __get_data_async(self, chirps_config: ChirpsConfig, session=None):
+        from shared import async_http_utils
+
+        if session is None:
+            async with async_http_utils.create_session(chirps_config.download_workers) as session:
+                await self.__get_data_async(chirps_config, session)
+            return
+        options = http_utils.create_download_options(chirps_config)
+        if chirps_config.streaming:
+            results = await async_http_utils.stream_files(
+                session, self.__prepare_stream(chirps_config),
+                functools.partial(self.__decode_streamed_file, chirps_config), options, self.__cache)
+        else:
+            folder_utils.create_folder(self.__get_folder_path(chirps_config))
+            results = await async_http_utils.download_files(
+                session, self.__generate_jobs(chirps_config), options, self.__cache, geo_utils.is_valid_raster)
+        self.__report_downloads(results)
+
+    def __generate_jobs(self, chirps_config: ChirpsConfig):
+        folder_path = self.__get_folder_path(chirps_config)
+        return [(url, folder_utils.join_path(folder_path, url.split('/')[-1]))
+                for url in self.__generate_urls(chirps_config)]
 
-    def __download_data(self):
-        current_date = datetime_utils.get_current_day()
+    def __generate_urls(self, chirps_config: ChirpsConfig):
+        current_date = self.issue_date
         date_str = datetime_utils.get_str_date_formatted(current_date, FormatDates.YEAR_MONTH_DAY_SLASH)
-        for file_number in range(0, self.__amount_file):
-            file_name_formatted_date = self.__generate_file_name_formatted_date(current_date, file_number)
-            server_url = self.__chirps_config.server_url + date_str + file_name_formatted_date
-            self.__write_files(server_url, file_name_formatted_date)
+        return [chirps_config.server_url + date_str
+                + self.__generate_file_name_formatted_date(chirps_config, current_date, n)
+                for n in range(0, self.__amount_file)]
 
-    def __generate_file_name_formatted_date(self, current_date, file_number: int) -> str:
+    @staticmethod
+    def __generate_file_name_formatted_date(chirps_config: ChirpsConfig, current_date, file_number: int) -> str:
         reference_date = datetime_utils.add_days_to_date(current_date, file_number)
         formatted_date = datetime_utils.get_str_date_formatted(reference_date, FormatDates.YEAR_POINT_MONTH_DAY)
-        file_name: str = self.__chirps_config.files_name
+        file_name: str = chirps_config.files_name
         return file_name.format(formatted_date)
 
-    def __write_files(self, server_url, file_name_formatted_date):
-        response = requests.get(server_url, stream=True)
-        path = folder_utils.join_path(self.__folder_path, file_name_formatted_date)
-        with open(file=path, mode=FileOpeningModes.OPEN_AND_TRUNCATE.value) as f:
-            for chunk in response.iter_content(chunk_size=self.__ideal_size):
-                if chunk:
-                    f.write(chunk)
-        response.close()
+    def __write_files(self, chirps_config: ChirpsConfig, jobs):
+        workers = chirps_config.download_workers
+        with http_utils.create_session(workers) as session:
+            results = http_utils.download_files(
+                session, jobs, workers, http_utils.create_download_options(chirps_config), self.__cache,
+                geo_utils.is_valid_raster)
+        self.__report_downloads(results)
+
+    def __report_downloads(self, results):
+        for result in results:
+            metrics.record_download("chirps", result)
+            if result.succeeded:
+                origin = "cache" if result.cached else "servidor"
+                menssage.info(f"Descargado {result.url} desde {origin} ({result.size} bytes en {result.elapsed:.2f} s)",
+                              url=result.url, size=result.size, elapsed=round(result.elapsed, 3), cached=result.cached)
+            elif result.decode_failed:
+                self.__decode_errors.append(result.error)
+                menssage.error(f"Error decodificando {result.url}: {result.error.__cause__}", url=result.url,
+                               error=repr(result.error.__cause__))
+            else:
+                menssage.error(f"Error descargando {result.url}: {result.error}", url=result.url,
+                               error=repr(result.error))
+        if self.__cache:
+            self.__cache.evict()
+
+    def __stream_data(self, chirps_config: ChirpsConfig):
+        workers = chirps_config.download_workers
+        with http_utils.create_session(workers) as session:
+            results = http_utils.stream_files(
+                session, self.__prepare_stream(chirps_config),
+                functools.partial(self.__decode_streamed_file, chirps_config), workers,
+                http_utils.create_download_options(chirps_config), self.__cache)
+        self.__report_downloads(results)
+
+    def __prepare_stream(self, chirps_config: ChirpsConfig):
+        urls = self.__generate_urls(chirps_config)
+        self.__cube = None
+        self.__streamed_index = None
+        self.__decode_errors = []
+        self.__streamed_dates = [self.__generate_date_format(url.split('/')[-1]) for url in urls]
+        return urls
 
-    def __generate_folder_path(self):
-        current_date = datetime_utils.get_current_date()
-        date_str = datetime_utils.get_str_date_formatted(current_date, FormatDates.YEAR_MONTH_DAY)
-        return folder_utils.join_path(self.__chirps_config.output_path, date_str)
+    def __decode_streamed_file(self, chirps_config: ChirpsConfig, result: http_utils.DownloadResult):
+        date = self.__generate_date_format(result.url.split('/')[-1])
+        with geo_utils.memory_file(result.content) as raster_path:
+            index = self.__get_geo_index(chirps_config, raster_path)
+            mtrx = geo_utils.read_window_matrix(raster_path, index.window)
+        with self.__lock:
+            if self.__cube is None:
+                self.__cube = self.__create_cube(self.__streamed_dates, index)
+                self.__streamed_index = index
+        self.__cube.fill(self.__streamed_dates.index(date), mtrx)
+
+    def __get_folder_path(self, chirps_config: ChirpsConfig):
+        date_str = datetime_utils.get_str_date_formatted(self.issue_date, FormatDates.YEAR_MONTH_DAY)
+        return folder_utils.join_path(chirps_config.output_path, date_str)
 
     # endregion
 
     # region ProcessData
     def process_data(self):
-        files_name = [file for file in folder_utils.list_dir(self.__folder_path)]
-        dates = [self.__generate_date_format(file_name) for file_name in folder_utils.list_dir(self.__folder_path)]
-        tiff_data_frame = pandas.DataFrame(data={'DATE': dates, 'FILE': files_name})
-        tiff_data_frame.set_index('DATE', inplace=True)
-        results = [self.__generate_vector(file_name) for n, file_name in enumerate(tiff_data_frame['FILE'])]
-        self.__time_series_resampling(results, tiff_data_frame)
-        folder_utils.delete_folder(self.__folder_path)
-
-    def __time_series_resampling(self, results, tiff_data_frame):
-        aux_forecast = pandas.DataFrame(data=results, index=tiff_data_frame.index, columns=self.__coordinates.POINTID)
-        self.__forecasts = aux_forecast * self.__daily_distribution
-        self.__forecasts = self.__forecasts.asfreq(freq=self.granularity, method='pad')
-
-    def __generate_vector(self, file_name):
-        n_cols = 'ncols'
-        raster_path = folder_utils.join_path(self.__folder_path, file_name)
-        raster = geo_utils.read_raster(raster_path)
-        row_up = math.floor(self.__top_cell / raster[n_cols])
-        col_left = (self.__lower_cell % raster[n_cols] - 1)
-        row_down = math.floor(self.__lower_cell / raster[n_cols]) + 1
-        col_right = self.__lower_cell % raster[n_cols]
-        return raster['mtrx'][row_up:row_down, col_left:col_right].ravel()
+        chirps_config = self.__chirps_config
+        if chirps_config.streaming:
+            cube, index = self.__cube, self.__streamed_index
+            self.__cube, self.__streamed_index = None, None
+            if cube is None:
+                if self.__decode_errors:
+                    raise http_utils.DecodeError("No downloaded CHIRPS day could be decoded") \
+                        from self.__decode_errors[0]
+                raise FileNotFoundError("No CHIRPS day was downloaded")
+            self.__write_forecasts(chirps_config, cube, index)
+            return
+        jobs = self.__get_decode_jobs(chirps_config)
+        matrices = parallel_utils.imap_ordered(
+            metrics.TimedCall(geo_utils.read_window_matrix), [path for _, path, _ in jobs],
+            [window for _, _, window in jobs], processes=chirps_config.processes)
+        self.__process_matrices(chirps_config, jobs, metrics.observe_calls("decode_seconds", matrices, source="chirps"))
+
+    def get_decode_jobs(self) -> list:
+        return self.__get_decode_jobs(self.__chirps_config)
+
+    def __get_decode_jobs(self, chirps_config: ChirpsConfig) -> list:
+        if chirps_config.streaming:
+            return []
+        partial = (http_utils.PART_EXTENSION, http_utils.VALIDATOR_EXTENSION)
+        folder_path = self.__get_folder_path(chirps_config)
+        files_name = sorted([file_name for file_name in folder_utils.list_dir(folder_path)
+                             if not file_name.endswith(partial)], key=self.__generate_date_format)
+        if not files_name:
+            raise FileNotFoundError(f"No CHIRPS day was downloaded to {folder_path}")
+        rasters_path = [folder_utils.join_path(folder_path, file_name) for file_name in files_name]
+        index = self.__get_geo_index(chirps_config, rasters_path[0])
+        return [(self.__generate_date_format(file_name), raster_path, index.window)
+                for file_name, raster_path in zip(files_name, rasters_path)]
+
+    def process_matrices(self, jobs: list, matrices) -> None:
+        self.__process_matrices(self.__chirps_config, jobs, matrices)
+
+    def __process_matrices(self, chirps_config: ChirpsConfig, jobs: list, matrices) -> None:
+        index = self.__get_geo_index(chirps_config, jobs[0][1])
+        cube = self.__create_cube([date for date, _, _ in jobs], index)
+        for position, mtrx in enumerate(matrices):
+            cube.fill(position, mtrx)
+        geo_utils.close_datasets()
+        folder_utils.delete_folder(self.__get_folder_path(chirps_config))
+        self.__write_forecasts(chirps_config, cube, index)
+
+    def __write_forecasts(self, chirps_config: ChirpsConfig, cube: geo_utils.RasterCube, index: geo_index.GeoIndex):
+        self.__time_series_resampling(chirps_config, cube, index)
+        with metrics.timer("aggregate_seconds", source="chirps"):
+            self.__aggregate_forecasts(chirps_config, index)
+        output_path = chirps_config.output_path
+        self.write_forecast(self.__forecasts, output_path, "chirps")
+        if self.__forecast_at_gauges is not None:
+            self.write_forecast(self.__forecast_at_gauges, output_path, "chirps_gauges")
+        if self.__basins_precipitation is not None:
+            self.write_forecast(self.__basins_precipitation, output_path, "chirps_basins")
+
+    def __time_series_resampling(self, chirps_config: ChirpsConfig, cube: geo_utils.RasterCube,
+                                 index: geo_index.GeoIndex):
+        with metrics.timer("extract_seconds", source="chirps"):
+            cube.drop_unfilled()
+            cube.mask_nodata()
+            daily = cube.take_points(index.offsets)
+        with metrics.timer("resample_seconds", source="chirps"):
+            self.__forecasts = disaggregation.disaggregate(
+                daily, cube.dates, self.__get_hourly_profile(chirps_config),
+                pandas.Index(index.point_ids, name='POINTID'))
+
+    def __get_hourly_profile(self, chirps_config: ChirpsConfig) -> disaggregation.HourlyProfile:
+        hourly_profile = chirps_config.hourly_profile
+        if hourly_profile == HourlyProfiles.DIURNAL.value:
+            basins = self.__metadata_store.read_table(chirps_config.basins_areas_path)
+            return disaggregation.load_diurnal_profile(
+                chirps_config.profile_path, basins,
+                AggregationColumns.BASIN.value, AggregationColumns.POINT.value, AggregationColumns.AREA.value)
+        if hourly_profile == HourlyProfiles.IDEAM.value:
+            return disaggregation.GuidedProfile(forecast_writer.read_forecast(chirps_config.profile_path))
+        return disaggregation.UniformProfile()
+
+    def __aggregate_forecasts(self, chirps_config: ChirpsConfig, index: geo_index.GeoIndex):
+        values = self.__forecasts.to_numpy()
+        gauge_aggregator = self.__get_gauge_aggregator(chirps_config, index)
+        if gauge_aggregator is not None:
+            self.__forecast_at_gauges = pandas.DataFrame(
+                data=gauge_aggregator.apply(values), index=self.__forecasts.index,
+                columns=gauge_aggregator.target_ids)
+        basin_aggregator = self.__get_basin_aggregator(chirps_config, index)
+        if basin_aggregator is not None:
+            self.__basins_precipitation = pandas.DataFrame(
+                data=basin_aggregator.apply(values), index=self.__forecasts.index,
+                columns=basin_aggregator.target_ids)
+
+    def __get_gauge_aggregator(self, chirps_config: ChirpsConfig,
+                               index: geo_index.GeoIndex) -> spatial_aggregation.SpatialAggregator:
+        if self.__gauge_aggregator is None:
+            stations = self.__metadata_store.read_table(chirps_config.stations_coordinates_path)
+            x_column, y_column = chirps_config.x_column, chirps_config.y_column
+            columns = [AggregationColumns.STATION.value, x_column, y_column]
+            if not all(column in stations for column in columns):
+                menssage.warning(f"Las estaciones no tienen las columnas {columns}, se omite la interpolacion")
+                return None
+            point_xs, point_ys = index.cell_centres()
+            self.__gauge_aggregator = spatial_aggregation.build_gauge_aggregator(
+                stations[AggregationColumns.STATION.value], stations[x_column], stations[y_column],
+                point_xs, point_ys, chirps_config.gauge_neighbours, chirps_config.idw_power)
+        return self.__gauge_aggregator
+
+    def __get_basin_aggregator(self, chirps_config: ChirpsConfig,
+                               index: geo_index.GeoIndex) -> spatial_aggregation.SpatialAggregator:
+        if self.__basin_aggregator is None:
+            if not folder_utils.exist_folder(chirps_config.basins_areas_path):
+                return None
+            basins = self.__metadata_store.read_table(chirps_config.basins_areas_path)
+            columns = [AggregationColumns.BASIN.value, AggregationColumns.POINT.value, AggregationColumns.AREA.value]
+            if not all(column in basins for column in columns):
+                menssage.warning(f"Las cuencas no tienen las columnas {columns}, se omite la agregacion por cuenca")
+                return None
+            self.__basin_aggregator = spatial_aggregation.build_basin_aggregator(
+                basins[AggregationColumns.BASIN.value], basins[AggregationColumns.POINT.value],
+                basins[AggregationColumns.AREA.value], index.point_ids)
+        return self.__basin_aggregator
+
+    @staticmethod
+    def __create_cube(dates, index: geo_index.GeoIndex) -> geo_utils.RasterCube:
+        return geo_utils.RasterCube(
+            dates, index.window[2], index.window[3], geo_utils.window_georef(index.georef, index.window))
+
+    def __get_geo_index(self, chirps_config: ChirpsConfig, raster_path) -> geo_index.GeoIndex:
+        with self.__lock:
+            if self.__geo_index is None:
+                georef, n_rows, n_cols = geo_utils.get_raster_grid(raster_path)
+                self.__geo_index = geo_index.load_or_build(
+                    chirps_config.coordinates_path, georef, (n_rows, n_cols),
+                    lambda source_mtime: self.__build_geo_index(
+                        chirps_config, georef, (n_rows, n_cols), source_mtime))
+        return self.__geo_index
+
+    def __build_geo_index(self, chirps_config: ChirpsConfig, georef, grid_shape,
+                          source_mtime) -> geo_index.GeoIndex:
+        x_column, y_column = chirps_config.x_column, chirps_config.y_column
+        coordinates = self.__get_coordinates(chirps_config)
+        if x_column in coordinates and y_column in coordinates:
+            return geo_index.build_geo_index(
+                coordinates.POINTID, coordinates[x_column], coordinates[y_column],
+                georef, grid_shape, source_mtime)
+        n_cols = grid_shape[1]
+        row_up = math.floor(self.__top_cell / n_cols)
+        col_left = (self.__lower_cell % n_cols - 1)
+        row_down = math.floor(self.__lower_cell / n_cols) + 1
+        col_right = self.__lower_cell % n_cols
+        window = (row_up, col_left, row_down - row_up, col_right - col_left)
+        return geo_index.build_window_index(coordinates.POINTID, window, georef, grid_shape, source_mtime)
+
+    def __get_coordinates(self, chirps_config: ChirpsConfig) -> DataFrame:
+        if self.__coordinates is None:
+            self.__coordinates = self.__metadata_store.read_table(chirps_config.coordinates_path)
+        return self.__coordinates
 
     @staticmethod
     def __generate_date_format(file_name: str) -> datetime:
@@ -1,4 +1,18 @@
+import asyncio
+import datetime
+import threading
 from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from pandas import DataFrame
+
+from infrastructure.data_source_service.forecast_archive import ForecastArchive
+from infrastructure.data_source_service.forecast_writer import ForecastWriter, CsvForecastWriter
+from shared import datetime_utils, metrics
+from shared.constants_application import DownloadDefaults
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 class DataSourceService(ABC):
@@ -6,8 +20,77 @@ class DataSourceService(ABC):
     def get_data(self):
         pass
 
+    async def get_data_async(self, session: 'aiohttp.ClientSession' = None):
+        """Non-blocking get_data; sources without a native implementation run the blocking one in a thread."""
+        await asyncio.to_thread(self.get_data)
+
 
 class ExternalDataSourceService(DataSourceService):
+    forecast_writer: ForecastWriter = CsvForecastWriter()
+    forecast_archive: ForecastArchive = None
+    stage_timeout: float = None
+    in_memory: bool = False
+    async_downloads: bool = False
+    depends_on_sources: list = []
+    issue_date: datetime.date = None
+
     @abstractmethod
     def process_data(self):
         pass
+
+    def set_issue_date(self, issue_date: datetime.date = None) -> None:
+        """Fixes the day whose files get_data downloads and process_data reads; today by default."""
+        self.issue_date = issue_date or datetime_utils.get_current_day()
+
+    def get_decode_jobs(self) -> list:
+        """(date, raster path, window) of every file process_data decodes, in date order; empty when not split."""
+        return []
+
+    @abstractmethod
+    def process_matrices(self, jobs: list, matrices) -> None:
+        """Finishes process_data from the matrices decoded for get_decode_jobs, in the same order."""
+        pass
+
+    def write_forecast(self, data_frame: DataFrame, folder: str, name: str) -> str:
+        issue_date = self.issue_date or datetime_utils.get_current_day()
+        with metrics.timer("write_seconds", source=name):
+            if self.forecast_archive:
+                self.forecast_archive.append(name, data_frame, issue_date)
+            return self.forecast_writer.write(data_frame, folder, name, issue_date)
+
+
+class SharedDownloadLoop:
+    """
+    One event loop in a background thread with the HTTP client every async source shares; each source stage
+    submits its download to it and waits, so the orchestrator keeps per-source stages and timeouts.
+    """
+
+    def __init__(self, limit_per_host: int = DownloadDefaults.WORKERS.value):
+        self.limit_per_host = limit_per_host
+        self.__loop: asyncio.AbstractEventLoop = None
+        self.__thread: threading.Thread = None
+        self.__session: 'aiohttp.ClientSession' = None
+
+    def __enter__(self):
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.__loop.run_forever, name="downloads", daemon=True)
+        self.__thread.start()
+        self.__session = self.__submit(self.__create_session())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.__submit(self.__session.close())
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join()
+        self.__loop.close()
+
+    def get_data(self, service: DataSourceService) -> None:
+        self.__submit(service.get_data_async(self.__session))
+
+    async def __create_session(self) -> 'aiohttp.ClientSession':
+        from shared import async_http_utils
+
+        return async_http_utils.create_session(self.limit_per_host)
+
+    def __submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.__loop).result()
@@ -0,0 +1,89 @@
+import datetime
+import os
+
+import pandas as pd
+from pandas import DataFrame
+
+from infrastructure.data_source_service.forecast_writer import PartitionedForecastWriter
+from shared import folder_utils
+
+
+class ForecastArchive:
+    """
+    Incremental archive of every issued forecast, one Parquet partition per source and issue date. A small index
+    records the valid-time range of each partition, so queries only open the partitions and point columns they need.
+    """
+    __INDEX_FILE = "index.csv"
+    __ISSUE_DATE = "ISSUE_DATE"
+    __VALID_START = "VALID_START"
+    __VALID_END = "VALID_END"
+    __PATH = "PATH"
+
+    def __init__(self, archive_path: str, compression: str = "snappy"):
+        self.archive_path = archive_path
+        self.__writer = PartitionedForecastWriter(compression)
+        folder_utils.create_folder_with_subfolders(archive_path)
+
+    def append(self, source: str, data_frame: DataFrame, issue_date: datetime) -> None:
+        path = self.__writer.write(data_frame, self.archive_path, source, issue_date)
+        issue_date = pd.Timestamp(issue_date)
+        index = self.read_index(source)
+        index = index[index[self.__ISSUE_DATE] != issue_date]
+        entry = DataFrame({
+            self.__ISSUE_DATE: [issue_date],
+            self.__VALID_START: [data_frame.index.min()],
+            self.__VALID_END: [data_frame.index.max()],
+            self.__PATH: [os.path.relpath(path, self.archive_path)]
+        })
+        index = pd.concat([index, entry], ignore_index=True).sort_values(self.__ISSUE_DATE)
+        self.__write_index(source, index)
+
+    def read_index(self, source: str) -> DataFrame:
+        index_path = self.__get_index_path(source)
+        if not folder_utils.exist_folder(index_path):
+            return DataFrame(columns=[self.__ISSUE_DATE, self.__VALID_START, self.__VALID_END, self.__PATH])
+        return pd.read_csv(index_path, parse_dates=[self.__ISSUE_DATE, self.__VALID_START, self.__VALID_END])
+
+    def query(
+        self,
+        source: str,
+        points: list = None,
+        issued_from: datetime = None,
+        issued_to: datetime = None,
+        valid_from: datetime = None,
+        valid_to: datetime = None
+    ) -> DataFrame:
+        """Returns the forecasts indexed by (ISSUE_DATE, DATE) with one column per requested point."""
+        index = self.read_index(source)
+        if issued_from is not None:
+            index = index[index[self.__ISSUE_DATE] >= pd.Timestamp(issued_from)]
+        if issued_to is not None:
+            index = index[index[self.__ISSUE_DATE] <= pd.Timestamp(issued_to)]
+        if valid_from is not None:
+            index = index[index[self.__VALID_END] >= pd.Timestamp(valid_from)]
+        if valid_to is not None:
+            index = index[index[self.__VALID_START] <= pd.Timestamp(valid_to)]
+
+        columns = None if points is None else [str(point) for point in points]
+        forecasts = []
+        for issue_date, path in zip(index[self.__ISSUE_DATE], index[self.__PATH]):
+            forecast = pd.read_parquet(folder_utils.join_path(self.archive_path, path), columns=columns)
+            forecast = forecast.loc[valid_from:valid_to]
+            forecasts.append(pd.concat({issue_date: forecast}, names=[self.__ISSUE_DATE]))
+        if not forecasts:
+            return DataFrame(columns=columns)
+        return pd.concat(forecasts)
+
+    def __get_index_path(self, source: str) -> str:
+        return folder_utils.join_path(folder_utils.join_path(self.archive_path, source), self.__INDEX_FILE)
+
+    def __write_index(self, source: str, index: DataFrame) -> None:
+        index_path = self.__get_index_path(source)
+        index.to_csv(index_path + ".part", index=False)
+        os.replace(index_path + ".part", index_path)
+
+
+def create_forecast_archive(source_config):
+    if not source_config.archive_path:
+        return None
+    return ForecastArchive(source_config.archive_path, source_config.compression or "snappy")
@@ -0,0 +1,101 @@
+import datetime
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from shared import datetime_utils, folder_utils
+from shared.constants_application import ForecastFormats, FormatDates
+
+
+class ForecastWriter(ABC):
+    extension = ""
+
+    @abstractmethod
+    def write(self, data_frame: DataFrame, folder: str, name: str, issue_date: datetime) -> str:
+        pass
+
+    @staticmethod
+    def _prepare(data_frame: DataFrame) -> DataFrame:
+        typed = data_frame.astype(np.float32)
+        typed.columns = typed.columns.astype(str)
+        typed.index.name = typed.index.name or 'DATE'
+        return typed
+
+
+class CsvForecastWriter(ForecastWriter):
+    extension = ".csv"
+
+    def write(self, data_frame: DataFrame, folder: str, name: str, issue_date: datetime) -> str:
+        path = folder_utils.join_path(folder, name + self.extension)
+        data_frame.to_csv(path)
+        return path
+
+
+class ParquetForecastWriter(ForecastWriter):
+    extension = ".parquet"
+
+    def __init__(self, compression: str = "snappy"):
+        self.compression = compression
+
+    def write(self, data_frame: DataFrame, folder: str, name: str, issue_date: datetime) -> str:
+        path = folder_utils.join_path(folder, name + self.extension)
+        self._prepare(data_frame).to_parquet(path, compression=self.compression, index=True)
+        return path
+
+
+class FeatherForecastWriter(ForecastWriter):
+    extension = ".feather"
+
+    def __init__(self, compression: str = "zstd"):
+        self.compression = compression
+
+    def write(self, data_frame: DataFrame, folder: str, name: str, issue_date: datetime) -> str:
+        path = folder_utils.join_path(folder, name + self.extension)
+        self._prepare(data_frame).reset_index().to_feather(path, compression=self.compression)
+        return path
+
+
+class PartitionedForecastWriter(ForecastWriter):
+    """Appends every run as its own issue_date=YYYYMMDD partition of a Parquet store, replacing same-day reruns."""
+    extension = ".parquet"
+    partition_key = "issue_date"
+
+    def __init__(self, compression: str = "snappy"):
+        self.compression = compression
+
+    def write(self, data_frame: DataFrame, folder: str, name: str, issue_date: datetime) -> str:
+        partition_path = self.get_partition_path(folder, name, issue_date)
+        folder_utils.create_folder_with_subfolders(partition_path)
+        path = folder_utils.join_path(partition_path, name + self.extension)
+        self._prepare(data_frame).to_parquet(path, compression=self.compression, index=True)
+        return path
+
+    def get_partition_path(self, folder: str, name: str, issue_date: datetime) -> str:
+        date_str = datetime_utils.get_str_date_formatted(issue_date, FormatDates.YEAR_MONTH_DAY)
+        return folder_utils.join_path(folder_utils.join_path(folder, name), f"{self.partition_key}={date_str}")
+
+
+def create_forecast_writer(output_format: str, compression: str = None) -> ForecastWriter:
+    writers = {
+        ForecastFormats.CSV.value: CsvForecastWriter,
+        ForecastFormats.PARQUET.value: ParquetForecastWriter,
+        ForecastFormats.FEATHER.value: FeatherForecastWriter,
+        ForecastFormats.PARTITIONED.value: PartitionedForecastWriter
+    }
+    if output_format not in writers:
+        raise ValueError(f"Unknown forecast output format: {output_format}")
+    writer = writers[output_format]
+    if writer is CsvForecastWriter or compression is None:
+        return writer()
+    return writer(compression)
+
+
+def read_forecast(path: str) -> DataFrame:
+    """Reads back, indexed by date, a forecast written by any of the writers."""
+    if path.endswith(ParquetForecastWriter.extension):
+        return pd.read_parquet(path)
+    if path.endswith(FeatherForecastWriter.extension):
+        return pd.read_feather(path).set_index('DATE')
+    return pd.read_csv(path, index_col=0, parse_dates=True)
@@ -1,74 +1,164 @@
-import shutil
+import asyncio
 import datetime as dt
 from pandas import DataFrame
 from dependency_injector.wiring import inject
-import urllib.request as request
-from contextlib import closing
-import zipfile
 import pandas as pd
-import numpy as np
 import math
-from osgeo import gdal
+import zipfile
 
+from infrastructure.data_source_service import forecast_archive, forecast_writer
 from infrastructure.data_source_service.data_source_service import ExternalDataSourceService
 from infrastructure.model_config.data_source_config_model import IdeamConfig
 from infrastructure.model_config.model_config_service import ModelConfigService
-from shared.constants_application import FormatDates, FileOpeningModes
-from shared import datetime_utils, folder_utils
+from shared.constants_application import FormatDates
+from shared import datetime_utils, download_cache, folder_utils, geo_index, geo_utils, http_utils, \
+    metadata_store, metrics, parallel_utils
 
 
 class IdeamService(ExternalDataSourceService):
     @inject
     def __init__(self, model_config: ModelConfigService):
-        self.__ideam_config: IdeamConfig = model_config.get_config_ideam()
-        self.__folder_path = self.__generate_folder_path()
+        self.__model_config = model_config
+        self.__apply_config(self.__ideam_config)
+        model_config.on_change(self.__on_config_change)
+        self.set_issue_date()
+
+    @property
+    def __ideam_config(self) -> IdeamConfig:
+        # Read through the service, so an edited configuration file is picked up by a long running process. Each
+        # run reads it once and passes that snapshot down, so a reload never lands in the middle of a run
+        return self.__model_config.get_config_ideam()
+
+    def __on_config_change(self, path: str) -> None:
+        if path == self.__model_config.project_path_constants.path_ideam_config:
+            self.__apply_config(self.__ideam_config)
+
+    def __apply_config(self, ideam_config: IdeamConfig) -> None:
+        self.__cache = download_cache.create_download_cache(ideam_config)
+        self.__metadata_store = metadata_store.create_metadata_store(ideam_config)
+        self.forecast_writer = forecast_writer.create_forecast_writer(
+            ideam_config.output_format, ideam_config.compression)
+        self.forecast_archive = forecast_archive.create_forecast_archive(ideam_config)
+        self.stage_timeout = ideam_config.stage_timeout
+        self.in_memory = ideam_config.streaming
+        self.async_downloads = ideam_config.async_downloads
+        self.__geo_index = None
 
-    __current_date = datetime_utils.get_current_day()
     __PREFIX_FILE = "geoTIFFprechorario"
     __EXTENSION_FILE = "00Z.zip"
+    __TOP_CELL = 23749
+    __LOWER_CELL = 38214
+    __geo_index: geo_index.GeoIndex = None
+
+    __zip_content: bytes = None
 
     def get_data(self):
-        folder_utils.create_folder_with_subfolders(self.__folder_path)
-        self.__download_data()
+        ideam_config = self.__ideam_config
+        if self.async_downloads:
+            asyncio.run(self.__get_data_async(ideam_config))
+            return
+        if ideam_config.streaming:
+            self.__zip_content = self.__download_content(ideam_config)
+            return
+        folder_utils.create_folder_with_subfolders(self.__get_folder_path(ideam_config))
+        self.__download_data(ideam_config)
+
+    async def get_data_async(self, session=None):
+        await self.__get_data_async(self.__ideam_config, session)
+
+    async def __get_data_async(self, ideam_config: IdeamConfig, session=None):
+        from shared import async_http_utils
+
+        if session is None:
+            async with async_http_utils.create_session(1) as session:
+                await self.__get_data_async(ideam_config, session)
+            return
+        url = ideam_config.server_url + self.__get_zip_name()
+        options = http_utils.create_download_options(ideam_config)
+        if ideam_config.streaming:
+            result = await async_http_utils.download_content(session, url, options, self.__cache)
+            self.__check_download(result)
+            self.__zip_content = result.content
+            return
+        folder_utils.create_folder_with_subfolders(self.__get_folder_path(ideam_config))
+        if folder_utils.exist_folder(self.__get_zip_path(ideam_config)):
+            return
+        result = await async_http_utils.download_file(
+            session, url, self.__get_zip_path(ideam_config), options, self.__cache, zipfile.is_zipfile)
+        self.__check_download(result)
 
     def process_data(self):
-        pronostico: DataFrame = self.__read_ideam_forecast(
-            self.__list_files_ideam())
-        pronostico.to_csv(folder_utils.join_path(
-            self.__ideam_config.output_path + "\\", "ideam.csv"))
-        folder_utils.delete_folder(self.__folder_path)
+        ideam_config = self.__ideam_config
+        if ideam_config.streaming:
+            zip_content, self.__zip_content = self.__zip_content, None
+            if zip_content is None:
+                raise FileNotFoundError("No IDEAM forecast was downloaded")
+            with http_utils.decoding(self.__get_zip_name()), geo_utils.memory_file(zip_content, 'zip') as path_zip:
+                jobs = self.__list_decode_jobs(ideam_config, path_zip)
+                pronostico = self.__read_ideam_forecast(ideam_config, jobs, self.__read_matrices(jobs, 1))
+            self.write_forecast(pronostico, ideam_config.output_path, "ideam")
+            return
+        jobs = self.__get_decode_jobs(ideam_config)
+        self.__process_matrices(ideam_config, jobs, self.__read_matrices(jobs, ideam_config.processes))
+
+    def get_decode_jobs(self) -> list:
+        return self.__get_decode_jobs(self.__ideam_config)
+
+    def __get_decode_jobs(self, ideam_config: IdeamConfig) -> list:
+        if ideam_config.streaming:
+            return []
+        return self.__list_decode_jobs(ideam_config, self.__get_zip_path(ideam_config))
+
+    def process_matrices(self, jobs: list, matrices) -> None:
+        self.__process_matrices(self.__ideam_config, jobs, matrices)
+
+    def __process_matrices(self, ideam_config: IdeamConfig, jobs: list, matrices) -> None:
+        pronostico: DataFrame = self.__read_ideam_forecast(ideam_config, jobs, matrices)
+        self.write_forecast(pronostico, ideam_config.output_path, "ideam")
+        geo_utils.close_datasets()
+        folder_utils.delete_folder(self.__get_folder_path(ideam_config))
+
+    def __get_folder_path(self, ideam_config: IdeamConfig):
+        date_str = datetime_utils.get_str_date_formatted(self.issue_date, FormatDates.YEAR_MONTH_DAY)
+        return folder_utils.join_path(ideam_config.output_path, date_str)
+
+    def __get_zip_name(self):
+        return self.__PREFIX_FILE + \
+            datetime_utils.get_str_date_formatted(
+                self.issue_date, FormatDates.DAY_MONTH_YEAR) + self.__EXTENSION_FILE
 
-    def __generate_folder_path(self):
-        date_str = datetime_utils.get_str_date_formatted(
-            datetime_utils.get_current_date(), FormatDates.YEAR_MONTH_DAY)
-        return folder_utils.join_path(self.__ideam_config.output_path, date_str)
+    def __get_zip_path(self, ideam_config: IdeamConfig):
+        return folder_utils.join_path(self.__get_folder_path(ideam_config), self.__get_zip_name())
 
     # region get_data
-    def __download_data(self):
-        file = self.__PREFIX_FILE + \
-            datetime_utils.get_str_date_formatted(
-                self.__current_date, FormatDates.DAY_MONTH_YEAR) + self.__EXTENSION_FILE
-
-        file_servidor = self.__ideam_config.server_url + file
-        path_file = folder_utils.join_path(
-            self.__folder_path, file)
-        with closing(request.urlopen(file_servidor)) as source:
-            if not folder_utils.exist_folder(path_file):
-                with open(path_file, FileOpeningModes.OPEN_AND_TRUNCATE.value) as destiny:
-                    shutil.copyfileobj(source, destiny)
+    def __download_data(self, ideam_config: IdeamConfig):
+        path_file = self.__get_zip_path(ideam_config)
+        if folder_utils.exist_folder(path_file):
+            return
+        with http_utils.create_session(1) as session:
+            result = http_utils.download_file(
+                session, ideam_config.server_url + self.__get_zip_name(), path_file,
+                http_utils.create_download_options(ideam_config), self.__cache, zipfile.is_zipfile)
+        self.__check_download(result)
+
+    def __download_content(self, ideam_config: IdeamConfig):
+        with http_utils.create_session(1) as session:
+            result = http_utils.download_content(
+                session, ideam_config.server_url + self.__get_zip_name(),
+                http_utils.create_download_options(ideam_config), self.__cache)
+        self.__check_download(result)
+        return result.content
+
+    def __check_download(self, result: http_utils.DownloadResult):
+        metrics.record_download("ideam", result)
+        if self.__cache:
+            self.__cache.evict()
+        if not result.succeeded:
+            raise result.error
     # endregion
 
     # region process_data
-    def __list_files_ideam(self):
-        file = self.__PREFIX_FILE + \
-            datetime_utils.get_str_date_formatted(
-                self.__current_date, FormatDates.DAY_MONTH_YEAR) + self.__EXTENSION_FILE
-
-        path_zip = folder_utils.join_path(
-            self.__folder_path, file)
-        zipe = zipfile.ZipFile(path_zip)
-        files = zipe.namelist()
-
+    def __list_files_ideam(self, files):
         list_file_siata = []
         for file in files:
             first_split = file.split('DIA')
@@ -77,7 +167,7 @@ class IdeamService(ExternalDataSourceService):
             timei = second_split[0][1:]
             timecorrection = dt.timedelta(days=int(datei)-1)
             datei_time = datetime_utils.get_str_date_formatted(
-                self.__current_date, FormatDates.YEAR_MONTH_DAY) + "-" + timei
+                self.issue_date, FormatDates.YEAR_MONTH_DAY) + "-" + timei
             date_time_obj = datetime_utils.get_date_of_str(
                 datei_time, FormatDates.YEAR_MONTH_DAY_HOUR)
             date_time_obj = date_time_obj + timecorrection
@@ -89,89 +179,56 @@ class IdeamService(ExternalDataSourceService):
         data_frame = data_frame.set_index('DATE')
         return data_frame
 
-    def __read_raster(self, path):
-        ext = path.lower().split('.')[-1]
-        if ext == 'asc':
-            rst = self.__read_tif_raster(path)
-        elif ext == 'tif' or ext == 'tiff':
-            rst = self.__read_tif_raster(path)
-        else:
-            print('File format not recognized')
-            rst = self.__build_raster(0.0, 0.0, 0.0, 0.0, np.array(0))
-        return rst
-
-    def __read_tif_raster(self, path):
-        tif = gdal.Open(path)
-        mtrx = tif.GetRasterBand(1).ReadAsArray().astype(float)
-        georef = tif.GetGeoTransform()
-        if georef[1] < 0:
-            xll = georef[0]+georef[1]*mtrx.shape[1]
-        else:
-            xll = georef[0]
-        if georef[5] < 0:
-            yll = georef[3]+georef[5]*mtrx.shape[0]
-        else:
-            yll = georef[3]
-        clsz = 0.5*(np.abs(georef[1])+np.abs(georef[5]))
-        nodt = tif.GetRasterBand(1).GetNoDataValue()
-        tif = None
-
-        rst = self.__build_raster(xll, yll, clsz, nodt, mtrx)
-        self.__change_no_data(rst, -9999.0)
-        return rst
-
-    def __build_raster(self, xll, yll, clsz, nodt, mtrx):
-        nrows = np.size(mtrx, 0)
-        ncols = np.size(mtrx, 1)
-        nclls = nrows*ncols
-        xur = xll+ncols*clsz
-        yur = yll+nrows*clsz
-
-        rst = {'ncols': ncols, 'nrows': nrows, 'nclls': nclls, 'xll': xll, 'yll': yll,
-               'xur': xur, 'yur': yur, 'clsz': clsz, 'nodt': nodt, 'mtrx': mtrx}
-        return rst
-
-    def __change_no_data(self, rst, new_nodt):
-        rst['mtrx'][np.where(rst['mtrx'] == rst['nodt'])] = new_nodt
-        rst['nodt'] = new_nodt
-
-    def __read_ideam_forecast(self, archivos):
-        file = self.__PREFIX_FILE + \
-            datetime_utils.get_str_date_formatted(
-                self.__current_date, FormatDates.DAY_MONTH_YEAR) + self.__EXTENSION_FILE
-        path_zip = folder_utils.join_path(
-            self.__folder_path, file)
-
-        path_temp = folder_utils.join_path(
-            self.__folder_path, 'temp')
-
-        if not folder_utils.exist_folder(path_temp):
-            folder_utils.create_folder(path_temp)
-        with zipfile.ZipFile(path_zip, 'r') as zipObj:
-            zipObj.extractall(path_temp)
-
-        results = []
-        for n, archivo in enumerate(archivos.FILE):
-            path_raster = folder_utils.join_path(
-                self.__folder_path + '\\' + 'temp', archivo)
-
-            raster = self.__read_raster(path_raster)
-
-            row_up = math.floor(23749/249)
-            col_left = (23749 % 249-1)
-            row_down = math.floor(38214/249)+1
-            col_right = (38214 % 249-1)+1
-            vector = raster['mtrx'][row_up:row_down,
-                                    col_left:col_right].ravel()
-            results.append(vector)
-
-        results = np.asarray(results)
-        base = pd.read_excel(folder_utils.join_path(
-            self.__ideam_config.output_path, self.__ideam_config.coordinates_path), sheet_name='ideam')
-        names = np.asarray(base.COD)
-
-        data_frame = pd.DataFrame(
-            data=results, index=archivos.index, columns=names)
-        shutil.rmtree(path_temp)
+    def __get_geo_index(self, ideam_config: IdeamConfig, raster_path) -> geo_index.GeoIndex:
+        if self.__geo_index is None:
+            georef, n_rows, n_cols = geo_utils.get_raster_grid(raster_path)
+            self.__geo_index = geo_index.load_or_build(
+                self.__get_coordinates_path(ideam_config), georef, (n_rows, n_cols),
+                lambda source_mtime: self.__build_geo_index(ideam_config, georef, (n_rows, n_cols), source_mtime))
+        return self.__geo_index
+
+    def __build_geo_index(self, ideam_config: IdeamConfig, georef, grid_shape, source_mtime) -> geo_index.GeoIndex:
+        base = self.__metadata_store.read_table(self.__get_coordinates_path(ideam_config), sheet_name='ideam')
+        x_column, y_column = ideam_config.x_column, ideam_config.y_column
+        if x_column in base and y_column in base:
+            return geo_index.build_geo_index(
+                base.COD, base[x_column], base[y_column], georef, grid_shape, source_mtime)
+        n_cols = grid_shape[1]
+        row_up = math.floor(self.__TOP_CELL/n_cols)
+        col_left = (self.__TOP_CELL % n_cols-1)
+        row_down = math.floor(self.__LOWER_CELL/n_cols)+1
+        col_right = (self.__LOWER_CELL % n_cols-1)+1
+        window = (row_up, col_left, row_down - row_up, col_right - col_left)
+        return geo_index.build_window_index(base.COD, window, georef, grid_shape, source_mtime)
+
+    @staticmethod
+    def __get_coordinates_path(ideam_config: IdeamConfig):
+        return folder_utils.join_path(ideam_config.output_path, ideam_config.coordinates_path)
+
+    def __list_decode_jobs(self, ideam_config: IdeamConfig, path_zip):
+        archivos = self.__list_files_ideam(geo_utils.list_zip(path_zip))
+        archivos = archivos.sort_index(kind='stable')
+        paths_raster = [geo_utils.zip_member_path(path_zip, archivo) for archivo in archivos.FILE]
+        index = self.__get_geo_index(ideam_config, paths_raster[0])
+        return [(date, path_raster, index.window) for date, path_raster in zip(archivos.index, paths_raster)]
+
+    @staticmethod
+    def __read_matrices(jobs, processes):
+        matrices = parallel_utils.imap_ordered(
+            metrics.TimedCall(geo_utils.read_window_matrix), [path for _, path, _ in jobs],
+            [window for _, _, window in jobs], processes=processes)
+        return metrics.observe_calls("decode_seconds", matrices, source="ideam")
+
+    def __read_ideam_forecast(self, ideam_config: IdeamConfig, jobs, matrices):
+        index = self.__get_geo_index(ideam_config, jobs[0][1])
+        dates = pd.DatetimeIndex([date for date, _, _ in jobs], name='DATE')
+        cube = geo_utils.RasterCube(dates, index.window[2], index.window[3],
+                                    geo_utils.window_georef(index.georef, index.window))
+        for position, mtrx in enumerate(matrices):
+            cube.fill(position, mtrx)
+
+        with metrics.timer("extract_seconds", source="ideam"):
+            data_frame = pd.DataFrame(
+                data=cube.take_points(index.offsets), index=dates, columns=index.point_ids)
         return data_frame
     # endregion
@@ -1,3 +1,7 @@
+from shared.constants_application import AggregationDefaults, CacheDefaults, CoordinateColumns, DownloadDefaults, \
+    ForecastFormats, HourlyProfiles
+
+
 class DataSourceConfig(object):
     def __init__(self, files_name):
         super().__init__()
@@ -12,10 +16,51 @@ class HydstraConfig(DataSourceConfig):
 
 
 class ExternalDataSourceConfig(DataSourceConfig):
-    def __init__(self, files_name, server_url, output_path):
+    def __init__(
+        self,
+        files_name,
+        server_url,
+        output_path,
+        download_workers=DownloadDefaults.WORKERS.value,
+        chunk_size=DownloadDefaults.CHUNK_SIZE.value,
+        timeout=DownloadDefaults.TIMEOUT.value,
+        retries=DownloadDefaults.RETRIES.value,
+        backoff=DownloadDefaults.BACKOFF.value,
+        streaming=False,
+        processes=1,
+        cache_path=None,
+        cache_max_age_days=CacheDefaults.MAX_AGE_DAYS.value,
+        cache_max_size_mb=CacheDefaults.MAX_SIZE_MB.value,
+        x_column=CoordinateColumns.X.value,
+        y_column=CoordinateColumns.Y.value,
+        output_format=ForecastFormats.CSV.value,
+        compression=None,
+        archive_path=None,
+        stage_timeout=None,
+        async_downloads=False,
+        metadata_cache_path=None
+    ):
         DataSourceConfig.__init__(self, files_name)
         self.server_url = server_url
         self.output_path = output_path
+        self.download_workers = download_workers
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.streaming = streaming
+        self.processes = processes
+        self.cache_path = cache_path
+        self.cache_max_age_days = cache_max_age_days
+        self.cache_max_size_mb = cache_max_size_mb
+        self.x_column = x_column
+        self.y_column = y_column
+        self.output_format = output_format
+        self.compression = compression
+        self.archive_path = archive_path
+        self.stage_timeout = stage_timeout
+        self.async_downloads = async_downloads
+        self.metadata_cache_path = metadata_cache_path
 
 
 class ChirpsConfig(ExternalDataSourceConfig):
@@ -27,12 +72,21 @@ class ChirpsConfig(ExternalDataSourceConfig):
         output_path,
         stations_coordinates_path,
         coordinates_path,
-        basins_areas_path
+        basins_areas_path,
+        gauge_neighbours=AggregationDefaults.NEIGHBOURS.value,
+        idw_power=AggregationDefaults.IDW_POWER.value,
+        hourly_profile=HourlyProfiles.UNIFORM.value,
+        profile_path=None,
+        **options
     ):
-        ExternalDataSourceConfig.__init__(self, files_name, server_url, output_path)
+        ExternalDataSourceConfig.__init__(self, files_name, server_url, output_path, **options)
         self.stations_coordinates_path = stations_coordinates_path
         self.coordinates_path = coordinates_path
         self.basins_areas_path = basins_areas_path
+        self.gauge_neighbours = gauge_neighbours
+        self.idw_power = idw_power
+        self.hourly_profile = hourly_profile
+        self.profile_path = profile_path
 
 
 class IdeamConfig(ExternalDataSourceConfig):
@@ -42,9 +96,10 @@ class IdeamConfig(ExternalDataSourceConfig):
         files_name,
         server_url,
         output_path,
-        coordinates_path
+        coordinates_path,
+        **options
     ):
-        ExternalDataSourceConfig.__init__(self, files_name, server_url, output_path)
+        ExternalDataSourceConfig.__init__(self, files_name, server_url, output_path, **options)
         self.coordinates_path = coordinates_path
 
 
@@ -1,51 +1,192 @@
+import ast
+import os
+import threading
+import time
+
 from infrastructure.model_config.data_source_config_model import ChirpsConfig, IdeamConfig
 from infrastructure.model_config.path_constants import ProjectPathConstants
 from infrastructure.model_config.project_config import ProjectConfig
+from shared.constants_application import AggregationDefaults, CacheDefaults, CoordinateColumns, DownloadDefaults, \
+    ConfigDefaults, ForecastFormats, HourlyProfiles, LogDefaults
 from shared.json_utils import parse_to_dictionary
 
+NUMBER = (int, float)
+OPTIONAL_TEXT = (str, type(None))
+OPTIONAL_NUMBER = (int, float, type(None))
+
+
+class ConfigError(ValueError):
+    pass
+
 
 class ModelConfigService:
-    def __init__(self, project_path_constants: ProjectPathConstants):
+    """
+    Parses every configuration file once and keeps the typed result. A file is only checked again for changes
+    after revalidate_seconds (configRevalidateSeconds in the project configuration), by its modification time and
+    size, and is re-parsed when it changed. Consumers read their configuration through the service and rebuild
+    what they derived from it in the callbacks registered with on_change, so a long running process picks up
+    edits without restarting.
+    """
+
+    def __init__(self, project_path_constants: ProjectPathConstants,
+                 revalidate_seconds: float = ConfigDefaults.REVALIDATE_SECONDS.value):
         self.project_path_constants = project_path_constants
+        self.revalidate_seconds = revalidate_seconds
+        self.__lock = threading.RLock()
+        self.__cache: dict[str, dict] = {}
+        self.__listeners = []
 
     def get_project_config(self) -> ProjectConfig:
-        project_config_path = self.project_path_constants.project_config_path
-        project_config = parse_to_dictionary(project_config_path)
+        project_config = self.__get(self.project_path_constants.project_config_path, self.__build_project_config)
+        self.revalidate_seconds = project_config.config_revalidate_seconds
+        return project_config
+
+    def get_config_chirps(self) -> ChirpsConfig:
+        return self.__get(self.project_path_constants.path_chirps_config, self.__build_config_chirps)
+
+    def get_config_ideam(self) -> IdeamConfig:
+        return self.__get(self.project_path_constants.path_ideam_config, self.__build_config_ideam)
+
+    def on_change(self, callback) -> None:
+        """Registers callback(path) to be called after a changed configuration file is reloaded."""
+        self.__listeners.append(callback)
+
+    def reload(self) -> None:
+        """Forgets every cached file, so the next access parses them again."""
+        with self.__lock:
+            self.__cache.clear()
+
+    def __get(self, path: str, build):
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__cache.get(path)
+            if entry and now - entry["checked"] < self.revalidate_seconds:
+                return entry["config"]
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if entry and entry["signature"] == signature:
+                entry["checked"] = now
+                return entry["config"]
+            config = build(parse_to_dictionary(path), path)
+            self.__cache[path] = {"signature": signature, "checked": now, "config": config}
+        if entry:
+            for listener in self.__listeners:
+                listener(path)
+        return config
+
+    def __build_project_config(self, project_config: dict, path: str) -> ProjectConfig:
         return ProjectConfig(
-            project_config["projects"],
-            project_config["parametrization"],
-            project_config["summaryString"],
-            project_config["timeSeriesString"],
-            project_config["logPath"],
-            project_config["deltaTime"]
+            self.__parse_projects(self.__require(project_config, "projects", (str, list), path), path),
+            self.__require(project_config, "parametrization", object, path),
+            self.__require(project_config, "summaryString", object, path),
+            self.__require(project_config, "timeSeriesString", object, path),
+            self.__require(project_config, "logPath", str, path),
+            self.__require(project_config, "deltaTime", NUMBER, path),
+            self.__option(project_config, "celeryBroker", "memory://", str, path),
+            self.__option(project_config, "celeryBackend", "cache+memory://", str, path),
+            self.__option(project_config, "metricsPath", None, OPTIONAL_TEXT, path),
+            self.__option(project_config, "profile", False, bool, path),
+            self.__option(project_config, "traceMemory", False, bool, path),
+            self.__option(project_config, "logMaxBytes", LogDefaults.MAX_BYTES.value, int, path),
+            self.__option(project_config, "logBackupCount", LogDefaults.BACKUP_COUNT.value, int, path),
+            self.__option(project_config, "configRevalidateSeconds", ConfigDefaults.REVALIDATE_SECONDS.value, NUMBER,
+                          path)
         )
 
-    def get_config_chirps(self) -> ChirpsConfig:
-        chirps_path = self.project_path_constants.path_chirps_config
-        chirps_config = parse_to_dictionary(chirps_path)
-        series_paths = chirps_config["relative_series_path"]
-        output_path = chirps_config["output_path"]
+    def __build_config_chirps(self, chirps_config: dict, path: str) -> ChirpsConfig:
+        series_paths = self.__require(chirps_config, "relative_series_path", dict, path)
+        output_path = self.__require(chirps_config, "output_path", str, path)
+        hourly_profile = self.__check_choice(
+            self.__option(chirps_config, "hourly_profile", HourlyProfiles.UNIFORM.value, str, path),
+            "hourly_profile", HourlyProfiles, path)
+        profile_path = self.__option(chirps_config, "profile_path", None, OPTIONAL_TEXT, path)
+        if hourly_profile != HourlyProfiles.UNIFORM.value and not profile_path:
+            raise ConfigError(f"{path}: 'profile_path' is required by the '{hourly_profile}' hourly_profile")
 
         return ChirpsConfig(
-            chirps_config["files_name"],
-            chirps_config["server_url"],
-            chirps_config["output_path"],
-            output_path + series_paths["stations_coordinates"],
-            output_path + series_paths["coordinates"],
-            output_path + series_paths["basins_areas_path"],
+            self.__require(chirps_config, "files_name", str, path),
+            self.__require(chirps_config, "server_url", str, path),
+            output_path,
+            output_path + self.__require(series_paths, "stations_coordinates", str, path),
+            output_path + self.__require(series_paths, "coordinates", str, path),
+            output_path + self.__require(series_paths, "basins_areas_path", str, path),
+            self.__option(chirps_config, "gauge_neighbours", AggregationDefaults.NEIGHBOURS.value, int, path),
+            self.__option(chirps_config, "idw_power", AggregationDefaults.IDW_POWER.value, NUMBER, path),
+            hourly_profile,
+            profile_path,
+            **self.__get_source_options(chirps_config, path)
         )
 
-
-    def get_config_ideam(self) -> IdeamConfig:
-        ideam_path = self.project_path_constants.path_ideam_config
-        ideam_config = parse_to_dictionary(ideam_path)
-        series_paths = ideam_config["relative_series_path"]
-        output_path = ideam_config["output_path"]
+    def __build_config_ideam(self, ideam_config: dict, path: str) -> IdeamConfig:
+        series_paths = self.__require(ideam_config, "relative_series_path", dict, path)
+        output_path = self.__require(ideam_config, "output_path", str, path)
 
         return IdeamConfig(
-            ideam_config["files_name"],
-            ideam_config["server_url"],
-            ideam_config["output_path"],
-            output_path + series_paths["coordinates"]
+            self.__require(ideam_config, "files_name", str, path),
+            self.__require(ideam_config, "server_url", str, path),
+            output_path,
+            output_path + self.__require(series_paths, "coordinates", str, path),
+            **self.__get_source_options(ideam_config, path)
         )
-        
\ No newline at end of file
+
+    def __get_source_options(self, source_config: dict, path: str) -> dict:
+        options = {
+            "download_workers": (DownloadDefaults.WORKERS.value, int),
+            "chunk_size": (DownloadDefaults.CHUNK_SIZE.value, int),
+            "timeout": (DownloadDefaults.TIMEOUT.value, NUMBER),
+            "retries": (DownloadDefaults.RETRIES.value, int),
+            "backoff": (DownloadDefaults.BACKOFF.value, NUMBER),
+            "streaming": (False, bool),
+            "processes": (1, int),
+            "cache_path": (None, OPTIONAL_TEXT),
+            "cache_max_age_days": (CacheDefaults.MAX_AGE_DAYS.value, NUMBER),
+            "cache_max_size_mb": (CacheDefaults.MAX_SIZE_MB.value, NUMBER),
+            "x_column": (CoordinateColumns.X.value, str),
+            "y_column": (CoordinateColumns.Y.value, str),
+            "output_format": (ForecastFormats.CSV.value, str),
+            "compression": (None, OPTIONAL_TEXT),
+            "archive_path": (None, OPTIONAL_TEXT),
+            "stage_timeout": (None, OPTIONAL_NUMBER),
+            "async_downloads": (False, bool),
+            "metadata_cache_path": (None, OPTIONAL_TEXT)
+        }
+        return {key: self.__option(source_config, key, default, types, path)
+                for key, (default, types) in options.items()}
+
+    @staticmethod
+    def __require(config: dict, key: str, types, path: str):
+        if key not in config:
+            raise ConfigError(f"{path}: missing required key '{key}'")
+        return ModelConfigService.__check_type(config[key], key, types, path)
+
+    @staticmethod
+    def __option(config: dict, key: str, default, types, path: str):
+        if key not in config:
+            return default
+        return ModelConfigService.__check_type(config[key], key, types, path)
+
+    @staticmethod
+    def __check_type(value, key: str, types, path: str):
+        types = types if isinstance(types, tuple) else (types,)
+        is_bool = isinstance(value, bool)
+        if not isinstance(value, types) or (is_bool and bool not in types and object not in types):
+            expected = ", ".join(expected_type.__name__ for expected_type in types)
+            raise ConfigError(f"{path}: '{key}' must be {expected}, got {type(value).__name__}")
+        return value
+
+    @staticmethod
+    def __check_choice(value, key: str, choices, path: str):
+        allowed = [choice.value for choice in choices]
+        if value not in allowed:
+            raise ConfigError(f"{path}: '{key}' must be one of {', '.join(allowed)}, got '{value}'")
+        return value
+
+    @staticmethod
+    def __parse_projects(projects, path: str) -> list:
+        if isinstance(projects, list):
+            return projects
+        try:
+            parsed = ast.literal_eval(projects)
+        except (ValueError, SyntaxError) as error:
+            raise ConfigError(f"{path}: 'projects' is not a valid literal: {error}")
+        return list(parsed) if isinstance(parsed, (list, tuple)) else [parsed]
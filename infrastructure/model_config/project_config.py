@@ -1,3 +1,6 @@
+from shared.constants_application import ConfigDefaults, LogDefaults
+
+
 class ProjectConfig:
     def __init__(
         self,
@@ -6,7 +9,15 @@ class ProjectConfig:
         summary_info,
         time_series_info,
         logPath,
-        delta_time=88000
+        delta_time=88000,
+        celery_broker="memory://",
+        celery_backend="cache+memory://",
+        metrics_path=None,
+        profile=False,
+        trace_memory=False,
+        log_max_bytes=LogDefaults.MAX_BYTES.value,
+        log_backup_count=LogDefaults.BACKUP_COUNT.value,
+        config_revalidate_seconds=ConfigDefaults.REVALIDATE_SECONDS.value
     ):
         self.projects = projects
         self.parameterization = parameterization
@@ -14,6 +25,14 @@ class ProjectConfig:
         self.time_series_info = time_series_info
         self.logPath = logPath
         self.delta_time = delta_time
+        self.celery_broker = celery_broker
+        self.celery_backend = celery_backend
+        self.metrics_path = metrics_path
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.log_max_bytes = log_max_bytes
+        self.log_backup_count = log_backup_count
+        self.config_revalidate_seconds = config_revalidate_seconds
 
 
 class ProjectParameters:
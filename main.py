@@ -1,5 +1,11 @@
-from hydrosed.start_up import wire_modules, run_app
+import argparse
+
+from hydrosed.start_up import SOURCES, wire_modules, run_app
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Descarga y procesa los pronosticos de precipitacion")
+    parser.add_argument("sources", nargs="*", help=f"fuentes a ejecutar, entre {', '.join(SOURCES)}; todas por defecto")
+    parser.add_argument("--celery", action="store_true", help="envia las fuentes como tareas de Celery")
+    args = parser.parse_args()
     wire_modules()
-    run_app()
+    run_app(args.sources or None, args.celery)
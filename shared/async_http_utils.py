@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+import time
+from http import HTTPStatus
+
+import aiohttp
+
+from shared import folder_utils
+from shared.constants_application import DownloadDefaults, FileOpeningModes
+from shared.download_cache import DownloadCache
+from shared.http_utils import (PART_EXTENSION, VALIDATOR_EXTENSION, DecodeError, DownloadOptions, DownloadResult,
+                               IncompleteDownloadError, build_headers, check_size, decoding, delete_part,
+                               get_validator, read_part_validator, write_part_validator)
+
+
+def create_session(limit_per_host: int = DownloadDefaults.WORKERS.value) -> aiohttp.ClientSession:
+    """Client shared by every source on the event loop; limit_per_host bounds the open connections per server."""
+    connector = aiohttp.TCPConnector(limit=0, limit_per_host=max(1, limit_per_host))
+    return aiohttp.ClientSession(connector=connector, auto_decompress=False)
+
+
+async def download_file(
+    session: aiohttp.ClientSession,
+    url: str,
+    path: str,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None,
+    validate=None
+) -> DownloadResult:
+    """Asynchronous counterpart of http_utils.download_file, with the same resume, validation and cache rules."""
+    options = options or DownloadOptions()
+    start = time.perf_counter()
+    target = cache.get_path(url) if cache else path
+    part_path = target + PART_EXTENSION
+    error = None
+    for attempt in range(options.retries + 1):
+        if attempt:
+            await asyncio.sleep(options.backoff * 2 ** (attempt - 1))
+        try:
+            fetched = await __fetch_to_part(session, url, part_path, options, cache)
+            if fetched is None:
+                size = await asyncio.to_thread(cache.copy_to, url, path)
+                return DownloadResult(url, path, size, time.perf_counter() - start, cached=True)
+            headers, size, checksum = fetched
+            if validate is not None and not await asyncio.to_thread(validate, part_path):
+                delete_part(part_path)
+                raise IncompleteDownloadError(f"{url} failed the integrity check")
+            os.replace(part_path, target)
+            folder_utils.delete_file(part_path + VALIDATOR_EXTENSION)
+            if cache:
+                cache.store(url, headers, size, checksum)
+                await asyncio.to_thread(cache.copy_to, url, path)
+            return DownloadResult(url, path, size, time.perf_counter() - start, checksum=checksum)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exception:
+            error = exception
+    return DownloadResult(url, path, 0, time.perf_counter() - start, error)
+
+
+async def download_files(
+    session: aiohttp.ClientSession,
+    jobs: list[tuple[str, str]],
+    options: DownloadOptions = None,
+    cache: DownloadCache = None,
+    validate=None
+) -> list[DownloadResult]:
+    """Downloads every (url, path) job on the running loop; concurrency is bounded by the session connector."""
+    return list(await asyncio.gather(
+        *[download_file(session, url, path, options, cache, validate) for url, path in jobs]))
+
+
+async def download_content(
+    session: aiohttp.ClientSession,
+    url: str,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None
+) -> DownloadResult:
+    options = options or DownloadOptions()
+    start = time.perf_counter()
+    buffer = bytearray()
+    validator = None
+    error = None
+    for attempt in range(options.retries + 1):
+        if attempt:
+            await asyncio.sleep(options.backoff * 2 ** (attempt - 1))
+        try:
+            if not validator:
+                buffer.clear()
+            headers = build_headers(len(buffer), cache, url, validator)
+            async with session.get(url, headers=headers, timeout=__get_timeout(options)) as response:
+                if response.status == HTTPStatus.NOT_MODIFIED:
+                    content = cache.read(url)
+                    return DownloadResult(url, size=len(content), elapsed=time.perf_counter() - start,
+                                          content=content, cached=True)
+                response.raise_for_status()
+                if response.status != HTTPStatus.PARTIAL_CONTENT:
+                    buffer.clear()
+                    validator = get_validator(response.headers)
+                offset = len(buffer)
+                async for chunk in response.content.iter_chunked(options.chunk_size):
+                    buffer.extend(chunk)
+                check_size(url, response.headers, offset, len(buffer))
+            content = bytes(buffer)
+            if cache:
+                await asyncio.to_thread(cache.write, url, response.headers, content)
+            return DownloadResult(url, size=len(content), elapsed=time.perf_counter() - start, content=content,
+                                  checksum=hashlib.sha256(content).hexdigest())
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as exception:
+            error = exception
+    return DownloadResult(url, size=len(buffer), elapsed=time.perf_counter() - start, error=error)
+
+
+async def stream_files(
+    session: aiohttp.ClientSession,
+    urls: list[str],
+    handler,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None
+) -> list[DownloadResult]:
+    """Downloads every url into memory and runs the blocking handler in a worker thread as each buffer arrives."""
+    async def fetch(url: str) -> DownloadResult:
+        result = await download_content(session, url, options, cache)
+        if result.succeeded:
+            try:
+                with decoding(url):
+                    await asyncio.to_thread(handler, result)
+            except DecodeError as error:
+                result.error = error
+            result.content = None
+        return result
+
+    return list(await asyncio.gather(*[fetch(url) for url in urls]))
+
+
+async def __fetch_to_part(session: aiohttp.ClientSession, url: str, part_path: str, options: DownloadOptions,
+                          cache: DownloadCache):
+    # File I/O runs in worker threads, so a slow disk or network share does not stall the event loop
+    offset = os.path.getsize(part_path) if folder_utils.exist_folder(part_path) else 0
+    validator = await asyncio.to_thread(read_part_validator, part_path) if offset else None
+    if not validator:
+        offset = 0
+    headers = build_headers(offset, cache, url, validator)
+    async with session.get(url, headers=headers, timeout=__get_timeout(options)) as response:
+        if response.status == HTTPStatus.NOT_MODIFIED:
+            return None
+        if response.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+            delete_part(part_path)
+            raise IncompleteDownloadError(f"{url} could not be resumed from byte {offset}")
+        response.raise_for_status()
+        if response.status != HTTPStatus.PARTIAL_CONTENT:
+            offset = 0
+            await asyncio.to_thread(write_part_validator, part_path, response.headers)
+
+        digest = await asyncio.to_thread(__hash_part, part_path, offset, options.chunk_size)
+        size = offset
+        mode = FileOpeningModes.OPEN_AND_APPEND if offset else FileOpeningModes.OPEN_AND_TRUNCATE
+        file = await asyncio.to_thread(open, part_path, mode.value)
+        try:
+            async for chunk in response.content.iter_chunked(options.chunk_size):
+                await asyncio.to_thread(file.write, chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        finally:
+            await asyncio.to_thread(file.close)
+        check_size(url, response.headers, offset, size)
+        return response.headers, size, digest.hexdigest()
+
+
+def __hash_part(part_path: str, offset: int, chunk_size: int):
+    digest = hashlib.sha256()
+    if offset:
+        with open(part_path, FileOpeningModes.OPEN_AND_WITHOUT_TRUNCATE.value) as f:
+            for block in iter(lambda: f.read(chunk_size), b''):
+                digest.update(block)
+    return digest
+
+
+def __get_timeout(options: DownloadOptions) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(sock_connect=options.timeout, sock_read=options.timeout)
@@ -25,4 +25,57 @@ class FileOpeningModes(Enum):
     BINARY_MODE = "b"
     TEXT_MODE = "t"
     OPEN_AND_TRUNCATE = "wb"
-    OPEN_AND_WITHOUT_TRUNCATE = "rb"
\ No newline at end of file
+    OPEN_AND_WITHOUT_TRUNCATE = "rb"
+    OPEN_AND_APPEND = "ab"
+
+
+class DownloadDefaults(Enum):
+    WORKERS = 4
+    CHUNK_SIZE = 1024 * 1024
+    TIMEOUT = 60
+    RETRIES = 3
+    BACKOFF = 2
+
+
+class CacheDefaults(Enum):
+    MAX_AGE_DAYS = 7
+    MAX_SIZE_MB = 2048
+
+
+class ConfigDefaults(Enum):
+    REVALIDATE_SECONDS = 5.0
+
+
+class LogDefaults(Enum):
+    MAX_BYTES = 10 * 1024 * 1024
+    BACKUP_COUNT = 5
+
+
+class CoordinateColumns(Enum):
+    X = "POINT_X"
+    Y = "POINT_Y"
+
+
+class ForecastFormats(Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+    FEATHER = "feather"
+    PARTITIONED = "partitioned"
+
+
+class AggregationColumns(Enum):
+    STATION = "STATION"
+    BASIN = "BASIN"
+    POINT = "POINTID"
+    AREA = "AREA"
+
+
+class HourlyProfiles(Enum):
+    UNIFORM = "uniform"
+    DIURNAL = "diurnal"
+    IDEAM = "ideam"
+
+
+class AggregationDefaults(Enum):
+    NEIGHBOURS = 1
+    IDW_POWER = 2.0
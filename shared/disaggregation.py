@@ -0,0 +1,130 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+HOURS_PER_DAY = 24
+
+
+class HourlyProfile(ABC):
+    """Fraction of every daily total that falls in each hour; the 24 fractions of a day add up to one."""
+
+    @abstractmethod
+    def weights(self, dates: pd.DatetimeIndex, point_ids) -> np.ndarray:
+        """Returns float32 weights broadcastable to (days, 24, points)."""
+        pass
+
+
+class UniformProfile(HourlyProfile):
+    def weights(self, dates: pd.DatetimeIndex, point_ids) -> np.ndarray:
+        return np.full((1, HOURS_PER_DAY, 1), 1 / HOURS_PER_DAY, dtype=np.float32)
+
+
+class DiurnalProfile(HourlyProfile):
+    """
+    Climatological diurnal cycle per basin. cycles holds 24 rows (hours 0 - 23) and one column per basin, and
+    point_basins maps every point to its basin; points without a known cycle are distributed uniformly.
+    """
+
+    def __init__(self, cycles: pd.DataFrame, point_basins: dict):
+        self.cycles = cycles.astype(np.float64)
+        self.point_basins = point_basins
+
+    def weights(self, dates: pd.DatetimeIndex, point_ids) -> np.ndarray:
+        cycles = self.cycles / self.cycles.sum(axis=0)
+        uniform = np.full(HOURS_PER_DAY, 1 / HOURS_PER_DAY)
+        columns = [cycles[self.point_basins[point_id]].to_numpy()
+                   if self.point_basins.get(point_id) in cycles else uniform for point_id in point_ids]
+        return np.stack(columns, axis=1).astype(np.float32)[np.newaxis]
+
+
+class GuidedProfile(HourlyProfile):
+    """
+    Takes the hourly shape of every day from a reference hourly forecast, such as IDEAM. A reference with a column
+    per point guides each point; otherwise its mean over all the columns guides every point. Days the reference
+    does not cover or forecasts dry are distributed uniformly.
+    """
+
+    def __init__(self, reference: pd.DataFrame):
+        self.reference = reference
+
+    def weights(self, dates: pd.DatetimeIndex, point_ids) -> np.ndarray:
+        reference = self.reference.clip(lower=0)
+        point_ids = [str(point_id) for point_id in point_ids]
+        reference.columns = [str(column) for column in reference.columns]
+        if set(point_ids).issubset(reference.columns):
+            reference = reference[point_ids]
+        else:
+            reference = reference.mean(axis=1).to_frame()
+
+        hours = expand_hours(dates)
+        shape = reference.reindex(hours).to_numpy(dtype=np.float64).reshape(len(dates), HOURS_PER_DAY, -1)
+        totals = np.nansum(shape, axis=1, keepdims=True)
+        valid = (totals > 0) & ~np.isnan(shape).any(axis=1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weights = np.where(valid, shape / totals, 1 / HOURS_PER_DAY)
+        return weights.astype(np.float32)
+
+
+class HourlySeries:
+    """
+    Lazy hourly view of daily totals: hours are only expanded, in float32, for the rows that are requested.
+    """
+
+    def __init__(self, daily: np.ndarray, dates: pd.DatetimeIndex, weights: np.ndarray, columns=None):
+        self.daily = np.asarray(daily, dtype=np.float32)
+        self.dates = pd.DatetimeIndex(dates)
+        self.weights = weights
+        self.columns = columns
+
+    def __len__(self) -> int:
+        return len(self.dates) * HOURS_PER_DAY
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return expand_hours(self.dates).rename('DATE')
+
+    def __getitem__(self, hours: slice) -> np.ndarray:
+        start, stop, step = hours.indices(len(self))
+        first_day, last_day = start // HOURS_PER_DAY, (max(stop, start + 1) - 1) // HOURS_PER_DAY + 1
+        days = self.__expand(first_day, last_day)
+        offset = first_day * HOURS_PER_DAY
+        return days[start - offset:stop - offset:step]
+
+    def to_numpy(self) -> np.ndarray:
+        return self.__expand(0, len(self.dates))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.to_numpy(), index=self.index, columns=self.columns)
+
+    def __expand(self, first_day: int, last_day: int) -> np.ndarray:
+        weights = self.weights if self.weights.shape[0] == 1 else self.weights[first_day:last_day]
+        hourly = self.daily[first_day:last_day, np.newaxis, :] * weights
+        return hourly.reshape(-1, self.daily.shape[1])
+
+
+def expand_hours(dates: pd.DatetimeIndex) -> pd.DatetimeIndex:
+    """The 24 hours of every date, so a day missing between two dates stays missing instead of shifting the rest."""
+    dates = pd.DatetimeIndex(dates)
+    return pd.DatetimeIndex((dates.values[:, np.newaxis] + np.arange(HOURS_PER_DAY) * np.timedelta64(1, 'h')).ravel())
+
+
+def disaggregate(daily: np.ndarray, dates, profile: HourlyProfile, point_ids=None, lazy: bool = False):
+    """
+    Splits (days, points) daily totals into hourly values with a single broadcast product. Every day, including
+    the last one, gets its 24 hours. Returns a DataFrame indexed by hour, or a HourlySeries when lazy.
+    """
+    dates = pd.DatetimeIndex(dates)
+    point_ids = list(range(np.shape(daily)[1])) if point_ids is None else list(point_ids)
+    series = HourlySeries(daily, dates, profile.weights(dates, point_ids), point_ids)
+    return series if lazy else series.to_frame()
+
+
+def load_diurnal_profile(cycles_path: str, basins: pd.DataFrame, basin_column: str, point_column: str,
+                         area_column: str) -> DiurnalProfile:
+    """Reads the hourly cycles CSV and assigns every point to the basin that covers most of its cell."""
+    cycles = pd.read_csv(cycles_path, index_col=0)
+    cycles.columns = [str(column) for column in cycles.columns]
+    largest = basins.sort_values(area_column).drop_duplicates(point_column, keep='last')
+    point_basins = dict(zip(largest[point_column], largest[basin_column].astype(str)))
+    return DiurnalProfile(cycles, point_basins)
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import shutil
+import time
+
+from shared import folder_utils
+from shared.constants_application import CacheDefaults, FileOpeningModes
+from shared.json_utils import parse_to_dictionary, write_dictionary
+
+
+class DownloadCache:
+    """On-disk cache of downloaded files keyed by source URL, revalidated with ETag / Last-Modified."""
+    __METADATA_EXTENSION = ".json"
+    __PART_EXTENSION = ".part"
+    __VALIDATOR_EXTENSION = ".validator"
+
+    def __init__(
+        self,
+        cache_path: str,
+        max_age_days: int = CacheDefaults.MAX_AGE_DAYS.value,
+        max_size_mb: int = CacheDefaults.MAX_SIZE_MB.value
+    ):
+        self.cache_path = cache_path
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.max_size = max_size_mb * 1024 * 1024
+        folder_utils.create_folder_with_subfolders(cache_path)
+
+    def get_path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode()).hexdigest()
+        extension = os.path.splitext(url.split('?')[0])[1]
+        return folder_utils.join_path(self.cache_path, key + extension)
+
+    def get_validators(self, url: str) -> dict:
+        metadata = self.__read_metadata(url)
+        if not metadata or not self.__is_complete(url, metadata):
+            return {}
+        headers = {}
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+        return headers
+
+    def store(self, url: str, headers, size: int, checksum: str = None) -> None:
+        now = time.time()
+        write_dictionary(self.__get_metadata_path(url), {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "size": size,
+            "sha256": checksum,
+            "stored_at": now,
+            "last_used": now
+        })
+
+    def write(self, url: str, headers, content: bytes) -> None:
+        part_path = self.get_path(url) + self.__PART_EXTENSION
+        with open(part_path, FileOpeningModes.OPEN_AND_TRUNCATE.value) as file:
+            file.write(content)
+        os.replace(part_path, self.get_path(url))
+        self.store(url, headers, len(content), hashlib.sha256(content).hexdigest())
+
+    def read(self, url: str) -> bytes:
+        with open(self.get_path(url), FileOpeningModes.OPEN_AND_WITHOUT_TRUNCATE.value) as file:
+            content = file.read()
+        self.__touch(url)
+        return content
+
+    def copy_to(self, url: str, path: str) -> int:
+        shutil.copyfile(self.get_path(url), path + self.__PART_EXTENSION)
+        os.replace(path + self.__PART_EXTENSION, path)
+        self.__touch(url)
+        return os.path.getsize(path)
+
+    def evict(self) -> None:
+        now = time.time()
+        entries = []
+        for name in folder_utils.list_dir(self.cache_path):
+            if not name.endswith(self.__METADATA_EXTENSION):
+                continue
+            metadata = parse_to_dictionary(folder_utils.join_path(self.cache_path, name))
+            if now - metadata["last_used"] > self.max_age or not self.__is_complete(metadata["url"], metadata):
+                self.__remove(metadata["url"])
+            else:
+                entries.append(metadata)
+
+        total_size = sum(entry["size"] for entry in entries)
+        for entry in sorted(entries, key=lambda item: item["last_used"]):
+            if total_size <= self.max_size:
+                break
+            self.__remove(entry["url"])
+            total_size -= entry["size"]
+
+    def __get_metadata_path(self, url: str) -> str:
+        return os.path.splitext(self.get_path(url))[0] + self.__METADATA_EXTENSION
+
+    def __read_metadata(self, url: str):
+        metadata_path = self.__get_metadata_path(url)
+        if not folder_utils.exist_folder(metadata_path):
+            return None
+        return parse_to_dictionary(metadata_path)
+
+    def __is_complete(self, url: str, metadata: dict) -> bool:
+        path = self.get_path(url)
+        return folder_utils.exist_folder(path) and os.path.getsize(path) == metadata["size"]
+
+    def __touch(self, url: str) -> None:
+        metadata = self.__read_metadata(url)
+        if metadata:
+            metadata["last_used"] = time.time()
+            write_dictionary(self.__get_metadata_path(url), metadata)
+
+    def __remove(self, url: str) -> None:
+        folder_utils.delete_file(self.get_path(url))
+        folder_utils.delete_file(self.get_path(url) + self.__PART_EXTENSION)
+        folder_utils.delete_file(self.get_path(url) + self.__PART_EXTENSION + self.__VALIDATOR_EXTENSION)
+        folder_utils.delete_file(self.__get_metadata_path(url))
+
+
+def create_download_cache(source_config):
+    if not source_config.cache_path:
+        return None
+    return DownloadCache(source_config.cache_path, source_config.cache_max_age_days, source_config.cache_max_size_mb)
@@ -26,4 +26,8 @@ def create_folder_with_subfolders(path: str) -> None:
 
 def exist_folder(path: str) -> bool:
     return os.path.exists(path)
-    
\ No newline at end of file
+
+
+def delete_file(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+
+from shared import folder_utils
+
+
+class GeoIndex:
+    """Maps forecast points to the raster window that covers them and to their flat offsets inside it."""
+
+    def __init__(self, point_ids, window, offsets, georef=None, grid_shape=None, source_mtime=0.0):
+        self.point_ids = np.asarray(point_ids)
+        if self.point_ids.dtype == object:
+            self.point_ids = self.point_ids.astype(str)
+        self.window = tuple(int(value) for value in window)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.georef = None if georef is None else tuple(float(value) for value in georef)
+        self.grid_shape = None if grid_shape is None else tuple(int(value) for value in grid_shape)
+        self.source_mtime = float(source_mtime)
+
+    def cell_centres(self) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the x and y coordinates of the centre of the cell that holds every point."""
+        row_off, col_off, _, window_cols = self.window
+        rows = self.offsets // window_cols + row_off
+        cols = self.offsets % window_cols + col_off
+        xs = self.georef[0] + (cols + 0.5) * self.georef[1]
+        ys = self.georef[3] + (rows + 0.5) * self.georef[5]
+        return xs, ys
+
+    def matches(self, georef, grid_shape, source_mtime) -> bool:
+        return self.georef == tuple(float(value) for value in georef) \
+            and self.grid_shape == tuple(int(value) for value in grid_shape) \
+            and self.source_mtime == float(source_mtime)
+
+    def save(self, path: str) -> None:
+        np.savez(path, point_ids=self.point_ids, window=np.asarray(self.window), offsets=self.offsets,
+                 georef=np.asarray(self.georef or []), grid_shape=np.asarray(self.grid_shape or []),
+                 source_mtime=np.asarray(self.source_mtime))
+
+    @classmethod
+    def load(cls, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            georef = data['georef'] if data['georef'].size else None
+            grid_shape = data['grid_shape'] if data['grid_shape'].size else None
+            return cls(data['point_ids'], data['window'], data['offsets'], georef, grid_shape,
+                       float(data['source_mtime']))
+
+
+def build_geo_index(point_ids, xs, ys, georef, grid_shape, source_mtime=0.0) -> GeoIndex:
+    """Locates every (x, y) point in the grid described by the GDAL geotransform georef."""
+    cols = np.floor((np.asarray(xs, dtype=float) - georef[0]) / georef[1]).astype(np.int64)
+    rows = np.floor((np.asarray(ys, dtype=float) - georef[3]) / georef[5]).astype(np.int64)
+    nrows, ncols = grid_shape
+    if rows.min() < 0 or cols.min() < 0 or rows.max() >= nrows or cols.max() >= ncols:
+        raise ValueError("There are points outside the raster grid")
+    row_off, col_off = rows.min(), cols.min()
+    window_rows, window_cols = rows.max() - row_off + 1, cols.max() - col_off + 1
+    offsets = (rows - row_off) * window_cols + (cols - col_off)
+    return GeoIndex(point_ids, (row_off, col_off, window_rows, window_cols), offsets, georef, grid_shape, source_mtime)
+
+
+def build_window_index(point_ids, window, georef, grid_shape, source_mtime=0.0) -> GeoIndex:
+    """Assigns the points, in order, to the cells of a fixed pixel window read in row-major order."""
+    if len(point_ids) != window[2] * window[3]:
+        raise ValueError(f"There are {len(point_ids)} points for the {window[2] * window[3]} cells of the window")
+    return GeoIndex(point_ids, window, np.arange(len(point_ids)), georef, grid_shape, source_mtime)
+
+
+def get_index_path(coordinates_path: str) -> str:
+    return os.path.splitext(coordinates_path)[0] + '_index.npz'
+
+
+def load_or_build(coordinates_path: str, georef, grid_shape, build) -> GeoIndex:
+    """
+    Returns the index persisted next to the coordinates file, rebuilding it with build(source_mtime) when the
+    coordinates file or the raster grid changed since it was saved.
+    """
+    index_path = get_index_path(coordinates_path)
+    source_mtime = os.path.getmtime(coordinates_path)
+    if folder_utils.exist_folder(index_path):
+        geo_index = GeoIndex.load(index_path)
+        if geo_index.matches(georef, grid_shape, source_mtime):
+            return geo_index
+    geo_index = build(source_mtime)
+    geo_index.save(index_path)
+    return geo_index
@@ -9,6 +9,12 @@ Created on Mon Jan 21 10:27:36 2022
 # Librerias
 # =============================================================================
 
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
 from osgeo import gdal
 
@@ -17,7 +23,7 @@ from osgeo import gdal
 # Funciones
 # =============================================================================
 
-def read_raster(path):
+def read_raster(path, dtype=np.float32, masked=False):
     u"""
     It loads a raster after identifiying the file extension
 
@@ -25,6 +31,12 @@ def read_raster(path):
     ----------
     path : text
         Raster file direction in the hard disk
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps the native
+        type of the band, which is float64 for Arc/ASCII files
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
 
     Returns
     -------
@@ -40,19 +52,11 @@ def read_raster(path):
             - nodt  : Missing data value
             - mtrx  : Data matrix
     """
-    # It identifies the file extension and reads the raster
-    ext = path.lower().split('.')[-1]
-    if ext == 'asc':
-        rst = read_tif_raster(path)
-    elif ext in ['tif', 'tiff']:
-        rst = read_tif_raster(path)
-    else:
-        print('File format not recognized')
-        rst = build_raster(0.0, 0.0, 0.0, 0.0, np.array(0))
-    return rst
+    # It reads the whole raster as a window that covers all of it
+    return read_raster_window(path, dtype=dtype, masked=masked)
 
 
-def read_tif_raster(path, missing=-9999.0):
+def read_tif_raster(path, missing=-9999.0, dtype=np.float32, masked=False):
     u"""
     It loads a GeoTiff raster file from the hard disk
 
@@ -62,8 +66,12 @@ def read_tif_raster(path, missing=-9999.0):
         Raster file direction in the hard disk
     missing _ float
         Value to be used as a missing / no data value
-    vrbl : text
-        Variable to be loaded
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps the native
+        type of the band
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
 
     Returns
     -------
@@ -79,29 +87,406 @@ def read_tif_raster(path, missing=-9999.0):
             - nodt  : Missing data value
             - mtrx  : Data matrix
     """
-    # It reads the georeferenciation properties and the data matrix
-    tif = gdal.Open(path)
-    mtrx = tif.GetRasterBand(1).ReadAsArray().astype(float)
+    # It reads the whole band as a window that covers the full raster
+    return read_tif_raster_window(path, missing=missing, dtype=dtype, masked=masked)
+
+
+def read_raster_window(path, window=None, bbox=None, missing=-9999.0, dtype=np.float32, masked=False):
+    u"""
+    It loads only a sub-window of a raster after identifiying the file
+    extension
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+    window : optional, tuple
+        Pixel window as (row_off, col_off, nrows, ncols)
+    bbox : optional, tuple
+        Bounding box as (xmin, ymin, xmax, ymax) in raster coordinates. It is
+        only used when window is not specified
+    missing : float
+        Value to be used as a missing / no data value
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps the native
+        type of the band
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
+
+    Returns
+    -------
+    rst : dictionary
+        Raster dictionary of the window, see read_raster
+    """
+    # It identifies the reader registered for the file extension
+    reader = get_reader(path)
+    if reader is None:
+        print('File format not recognized')
+        rst = build_raster(0.0, 0.0, 0.0, 0.0, np.array(0))
+    else:
+        rst = reader(path, window, bbox, missing, dtype, masked)
+    return rst
+
+
+def read_tif_raster_window(path, window=None, bbox=None, missing=-9999.0, dtype=np.float32, masked=False):
+    u"""
+    It loads a sub-window of a GDAL readable raster file from the hard disk,
+    the rest of the band is never decoded
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+    window : optional, tuple
+        Pixel window as (row_off, col_off, nrows, ncols). The whole band is
+        read when neither window nor bbox are specified
+    bbox : optional, tuple
+        Bounding box as (xmin, ymin, xmax, ymax) in raster coordinates
+    missing : float
+        Value to be used as a missing / no data value
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps the native
+        type of the band
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
+
+    Returns
+    -------
+    rst : dictionary
+        Raster dictionary of the window, see read_tif_raster
+    """
+    # It computes the pixel window and reads only that part of the band
+    tif = open_dataset(path)
     georef = tif.GetGeoTransform()
+    if window is None and bbox is not None:
+        window = bbox_to_window(georef, bbox, tif.RasterYSize, tif.RasterXSize)
+    if window is None:
+        window = (0, 0, tif.RasterYSize, tif.RasterXSize)
+    row_off, col_off, nrows, ncols = window
+    band = tif.GetRasterBand(1)
+    mtrx = band.ReadAsArray(col_off, row_off, ncols, nrows)
+    if dtype is not None:
+        mtrx = mtrx.astype(dtype, copy=False)
+    nodt = band.GetNoDataValue()
+
+    return __build_window_raster(georef, window, nodt, mtrx, missing, masked)
+
+
+__ASCII_HEADER_KEYS = ('ncols', 'nrows', 'xllcorner', 'yllcorner', 'xllcenter', 'yllcenter', 'cellsize',
+                       'nodata_value')
+
+
+def read_ascii_raster_window(path, window=None, bbox=None, missing=-9999.0, dtype=np.float32, masked=False):
+    u"""
+    It loads a sub-window of an Arc/ASCII raster file from the hard disk. The
+    whole grid is parsed in one vectorised pass, and a window only parses its
+    rows
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+    window : optional, tuple
+        Pixel window as (row_off, col_off, nrows, ncols). The whole grid is
+        read when neither window nor bbox are specified
+    bbox : optional, tuple
+        Bounding box as (xmin, ymin, xmax, ymax) in raster coordinates
+    missing : float
+        Value to be used as a missing / no data value
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps float64
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
+
+    Returns
+    -------
+    rst : dictionary
+        Raster dictionary of the window, see read_tif_raster
+    """
+    # It reads the header, which ends at the first line that is not one of its keys, as data rows may start
+    # with nan or inf
+    hdr = {}
+    with open(path, 'rb') as file:
+        while True:
+            position = file.tell()
+            line = file.readline().split()
+            if not line or line[0].decode().lower() not in __ASCII_HEADER_KEYS:
+                file.seek(position)
+                break
+            hdr[line[0].decode().lower()] = float(line[1])
+        grid_rows, grid_cols = int(hdr['nrows']), int(hdr['ncols'])
+        clsz = hdr['cellsize']
+        xll = hdr['xllcorner'] if 'xllcorner' in hdr else hdr['xllcenter'] - 0.5 * clsz
+        yll = hdr['yllcorner'] if 'yllcorner' in hdr else hdr['yllcenter'] - 0.5 * clsz
+        georef = (xll, clsz, 0.0, yll + grid_rows * clsz, 0.0, -clsz)
+        if window is None and bbox is not None:
+            window = bbox_to_window(georef, bbox, grid_rows, grid_cols)
+
+        # It parses the data block, the full grid in a single call
+        if window is None:
+            window = (0, 0, grid_rows, grid_cols)
+            mtrx = np.fromfile(file, dtype=np.float64, sep=' ').reshape(grid_rows, grid_cols)
+        else:
+            row_off, col_off, nrows, ncols = window
+            mtrx = np.loadtxt(file, dtype=np.float64, skiprows=row_off, max_rows=nrows,
+                              usecols=range(col_off, col_off + ncols), ndmin=2)
+    if dtype is not None:
+        mtrx = mtrx.astype(dtype, copy=False)
+
+    return __build_window_raster(georef, window, hdr.get('nodata_value'), mtrx, missing, masked)
+
+
+def __build_window_raster(georef, window, nodt, mtrx, missing, masked):
+    # It moves the origin of the geotransform to the window corner
+    georef = window_georef(georef, window)
     if georef[1] < 0:
-        xll = georef[0] + georef[1] * mtrx.shape[1]  # np.size(mtrx,1)
+        xll = georef[0] + georef[1] * mtrx.shape[1]
     else:
         xll = georef[0]
     if georef[5] < 0:
-        yll = georef[3] + georef[5] * mtrx.shape[0]  # np.size(mtrx,0)
+        yll = georef[3] + georef[5] * mtrx.shape[0]
     else:
         yll = georef[3]
     clsz = 0.5 * (np.abs(georef[1]) + np.abs(georef[5]))
-    nodt = tif.GetRasterBand(1).GetNoDataValue()
-    tif = None
 
     # It builds the Raster dictionary and returns
     rst = build_raster(xll, yll, clsz, nodt, mtrx)
-    rst['mtrx'][np.where(rst['mtrx'] == rst['nodt'])] = missing
-    rst['nodt'] = missing
+    change_no_data(rst, missing, masked)
     return rst
 
 
+def change_no_data(rst, new_nodt, masked=False):
+    u"""
+    It replaces in place the missing data value of a Raster dictionary. Bands
+    whose type cannot hold the new value are promoted to float32
+
+    Parameters
+    ----------
+    rst : dictionary
+        Raster dictionary
+    new_nodt : number
+        New missing data value
+    masked : optional, boolean
+        If True, the matrix is turned into a masked array hiding the missing
+        data
+    """
+    mtrx = rst['mtrx']
+    if rst['nodt'] is None:
+        mask = np.zeros(mtrx.shape, dtype=bool)
+    elif np.isnan(rst['nodt']):
+        mask = np.isnan(mtrx)
+    else:
+        mask = mtrx == rst['nodt']
+    if not __can_hold(mtrx.dtype, new_nodt):
+        mtrx = mtrx.astype(np.float32)
+    np.putmask(mtrx, mask, new_nodt)
+    if masked:
+        mtrx = np.ma.MaskedArray(mtrx, mask=mask, fill_value=new_nodt)
+    rst['mtrx'] = mtrx
+    rst['nodt'] = new_nodt
+
+
+def __can_hold(dtype, value):
+    # It checks if an array of type dtype can store value without losing it
+    if dtype.kind == 'f':
+        return True
+    if dtype.kind in 'iu':
+        info = np.iinfo(dtype)
+        return float(value).is_integer() and info.min <= value <= info.max
+    return False
+
+
+def window_georef(georef, window):
+    u"""
+    It moves the origin of a GDAL geotransform to the corner of a pixel window
+
+    Parameters
+    ----------
+    georef : tuple
+        GDAL geotransform of the raster
+    window : tuple
+        Pixel window as (row_off, col_off, nrows, ncols)
+
+    Returns
+    -------
+    georef : tuple
+        GDAL geotransform of the window
+    """
+    row_off, col_off = window[0], window[1]
+    return (georef[0] + col_off * georef[1] + row_off * georef[2], georef[1], georef[2],
+            georef[3] + col_off * georef[4] + row_off * georef[5], georef[4], georef[5])
+
+
+def read_window_matrix(path, window=None, missing=-9999.0, dtype=np.float32):
+    u"""
+    It loads a raster window and returns only its data matrix. It is a module
+    level function so it can be sent to worker processes
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+    window : optional, tuple
+        Pixel window as (row_off, col_off, nrows, ncols)
+    missing : float
+        Value to be used as a missing / no data value
+    dtype : optional, type
+        Data type of the matrix. By default np.float32; None keeps the native
+        type of the band
+
+    Returns
+    -------
+    mtrx : array
+        Window data matrix
+    """
+    return read_raster_window(path, window, None, missing, dtype)['mtrx']
+
+
+@contextmanager
+def memory_file(buffer, ext='tif'):
+    u"""
+    It exposes an in-memory raster (or zip archive of rasters) as a GDAL
+    /vsimem/ path, so it can be read without touching the hard disk. The memory
+    file is released on exit
+
+    Parameters
+    ----------
+    buffer : bytes
+        File content
+    ext : optional, text
+        File extension used to identify the format
+
+    Returns
+    -------
+    path : text
+        GDAL virtual path of the file
+    """
+    path = '/vsimem/' + uuid.uuid4().hex + '.' + ext
+    gdal.FileFromMemBuffer(path, buffer)
+    try:
+        yield path
+    finally:
+        gdal.Unlink(path)
+
+
+def list_zip(path):
+    u"""
+    It lists the files of a zip archive through GDAL /vsizip/, without
+    extracting it
+
+    Parameters
+    ----------
+    path : text
+        Zip file direction in the hard disk or /vsimem/ path
+
+    Returns
+    -------
+    files : list
+        Names of the entries in the root of the archive
+    """
+    return gdal.ReadDir(zip_member_path(path)) or []
+
+
+def zip_member_path(path, member=None):
+    u"""
+    It builds the GDAL /vsizip/ path of a file inside a zip archive, so it can
+    be read as any other raster
+
+    Parameters
+    ----------
+    path : text
+        Zip file direction in the hard disk or /vsimem/ path
+    member : optional, text
+        File name inside the archive. The root of the archive is returned when
+        it is not specified
+
+    Returns
+    -------
+    path : text
+        GDAL virtual path of the member
+    """
+    root = '/vsizip/' + path.replace('\\', '/')
+    return root if member is None else root + '/' + member
+
+
+def is_valid_raster(path):
+    u"""
+    It checks that a raster file can be opened and that its last row can be
+    decoded, which fails for truncated or corrupt files
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+
+    Returns
+    -------
+    valid : boolean
+        True when the raster is readable
+    """
+    tif = gdal.Open(path)
+    if tif is None or tif.RasterCount < 1:
+        return False
+    last_row = tif.GetRasterBand(1).ReadAsArray(0, tif.RasterYSize - 1, tif.RasterXSize, 1)
+    tif = None
+    return last_row is not None
+
+
+def get_raster_grid(path):
+    u"""
+    It reads the geotransform and size of a raster without loading data
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+
+    Returns
+    -------
+    georef : tuple
+        GDAL geotransform of the raster
+    nrows : integer
+        Number of rows
+    ncols : integer
+        Number of columns
+    """
+    tif = open_dataset(path)
+    return tif.GetGeoTransform(), tif.RasterYSize, tif.RasterXSize
+
+
+def bbox_to_window(georef, bbox, nrows, ncols):
+    u"""
+    It converts a bounding box into the pixel window that covers it
+
+    Parameters
+    ----------
+    georef : tuple
+        GDAL geotransform of the raster
+    bbox : tuple
+        Bounding box as (xmin, ymin, xmax, ymax)
+    nrows : integer
+        Number of rows of the raster
+    ncols : integer
+        Number of columns of the raster
+
+    Returns
+    -------
+    window : tuple
+        Pixel window as (row_off, col_off, nrows, ncols) clipped to the raster
+    """
+    xmin, ymin, xmax, ymax = bbox
+    cols = sorted([(xmin - georef[0]) / georef[1], (xmax - georef[0]) / georef[1]])
+    rows = sorted([(ymin - georef[3]) / georef[5], (ymax - georef[3]) / georef[5]])
+    col_off = min(max(int(np.floor(cols[0])), 0), ncols)
+    row_off = min(max(int(np.floor(rows[0])), 0), nrows)
+    col_end = min(max(int(np.ceil(cols[1])), col_off), ncols)
+    row_end = min(max(int(np.ceil(rows[1])), row_off), nrows)
+    return row_off, col_off, row_end - row_off, col_end - col_off
+
+
 def build_raster(xll, yll, clsz, nodt, mtrx):
     u"""
     It builds a Raster dictionary when all of its attributes are specified
@@ -137,9 +522,75 @@ def build_raster(xll, yll, clsz, nodt, mtrx):
     return rst
 
 
-def write_ascii_raster(path, rst):
+class RasterCube:
+    u"""
+    Stack of rasters that share the same grid, stored as a single
+    preallocated (time, rows, cols) array so every operation runs over all
+    the dates at once
+
+    Parameters
+    ----------
+    dates : list
+        Date of every layer, in the order they are stored
+    nrows : integer
+        Number of rows of every layer
+    ncols : integer
+        Number of columns of every layer
+    georef : optional, tuple
+        GDAL geotransform shared by every layer
+    nodt : optional, float
+        Missing data value of the layers
+    dtype : optional, type
+        Data type of the cube. By default np.float32
+    """
+
+    def __init__(self, dates, nrows, ncols, georef=None, nodt=-9999.0, dtype=np.float32):
+        self.dates = list(dates)
+        self.georef = georef
+        self.nodt = nodt
+        self.data = np.full((len(self.dates), nrows, ncols), nodt, dtype=dtype)
+        self.filled = np.zeros(len(self.dates), dtype=bool)
+
+    def fill(self, position, mtrx):
+        u"""
+        It copies a decoded raster matrix into the layer at position
+        """
+        self.data[position] = mtrx
+        self.filled[position] = True
+
+    def drop_unfilled(self):
+        u"""
+        It removes the layers that were never filled, e.g. failed downloads
+        """
+        if not self.filled.all():
+            self.data = self.data[self.filled]
+            self.dates = [date for date, filled in zip(self.dates, self.filled) if filled]
+            self.filled = np.ones(len(self.dates), dtype=bool)
+
+    def mask_nodata(self, value=np.nan):
+        u"""
+        It replaces in place the missing data of every layer with value
+        """
+        np.putmask(self.data, self.data == self.nodt, value)
+        self.nodt = value
+
+    def take_points(self, offsets):
+        u"""
+        It extracts the cells at the flat offsets of every layer
+
+        Returns
+        -------
+        values : array
+            (time, points) matrix
+        """
+        return self.data.reshape(len(self.dates), -1).take(offsets, axis=1)
+
+
+def write_ascii_raster(path, rst, dcmls=None, chunk_cells=1000000):
     u"""
-    It saves a Raster dictionary in the hard disk using the Arc/ASCII format
+    It saves a Raster dictionary in the hard disk using the Arc/ASCII format.
+    Rows are formatted in chunks with a single format operation each, and
+    written through a buffered file
 
     Parameters
     ----------
@@ -147,6 +598,11 @@ def write_ascii_raster(path, rst):
         Direction in the hard disk in which the Arc/ASCII file will be written
     rst: dictionary
         AsciiRaster dictionary to export
+    dcmls: optional, integer
+        Number of decimals to write. By default the shortest format that
+        round-trips the matrix type exactly is used
+    chunk_cells: optional, integer
+        Approximate number of cells formatted per write
     """
     # It builds the header information string
     hdr = 'ncols        ' + str(rst['ncols']) \
@@ -156,15 +612,55 @@ def write_ascii_raster(path, rst):
           + '\ncellsize     ' + str(rst['clsz']) \
           + '\nnodata_value ' + str(rst['nodt'])
 
+    # It chooses the number format and fills the masked cells
+    mtrx = np.ma.filled(rst['mtrx'], rst['nodt'])
+    if dcmls is not None:
+        fmt = '%.' + str(dcmls) + 'f'
+    elif mtrx.dtype.kind in 'iub':
+        fmt = '%d'
+    elif mtrx.dtype.itemsize <= 4:
+        fmt = '%.9g'
+    else:
+        fmt = '%.17g'
+    row_fmt = '\n' + ' '.join([fmt] * rst['ncols'])
+    chunk_rows = max(1, chunk_cells // max(1, rst['ncols']))
+
     # It saves data in the hard disk and finishes
-    with open(path, 'w') as file:
+    with open(path, 'w', buffering=1024 * 1024) as file:
         file.write(hdr)
-        for row in rst['mtrx']:
-            line = '\n' + ' '.join(row.astype('str'))
-            file.write(line)
+        for start in range(0, rst['nrows'], chunk_rows):
+            chunk = mtrx[start:start + chunk_rows]
+            file.write((row_fmt * len(chunk)) % tuple(chunk.ravel().tolist()))
 
 
-def write_tif_raster(path, rst, prcsn=gdal.GDT_Float32):
+def read_ascii_raster(path, missing=-9999.0, dtype=None, masked=False):
+    u"""
+    It loads an Arc/ASCII raster file from the hard disk. By default values
+    are kept as float64. A file written by write_ascii_raster is read back
+    exactly when dtype is the type of the written matrix, e.g. np.float32
+    for float32 matrices, since the file itself does not record it
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+    missing : float
+        Value to be used as a missing / no data value
+    dtype : optional, type
+        Data type of the matrix. By default None keeps float64
+    masked : optional, boolean
+        If True, the matrix is returned as a masked array hiding the missing
+        data
+
+    Returns
+    -------
+    rst : dictionary
+        Raster dictionary, see read_tif_raster
+    """
+    return read_ascii_raster_window(path, missing=missing, dtype=dtype, masked=masked)
+
+
+def write_tif_raster(path, rst, prcsn=gdal.GDT_Float32, compress=None, tiled=False):
     u"""
     It saves a Raster dictionary in the hard disk using the GeoTiff format
 
@@ -177,23 +673,37 @@ def write_tif_raster(path, rst, prcsn=gdal.GDT_Float32):
     prcsn: optional, integer
         Data precision. By default gdal.GDT_Float32, but any other data type
         can be specified
+    compress: optional, text
+        Compression algorithm, e.g. 'DEFLATE' or 'LZW'. By default the file is
+        not compressed
+    tiled: optional, boolean
+        If True, the file is written in 256x256 tiles instead of strips
     """
+    # It builds the creation options
+    options = []
+    if compress:
+        options.append('COMPRESS=' + compress.upper())
+        floating = prcsn in [gdal.GDT_Float32, gdal.GDT_Float64]
+        options.append('PREDICTOR=' + ('3' if floating else '2'))
+    if tiled:
+        options.append('TILED=YES')
+
     # It creates the driver and the file
     driver = gdal.GetDriverByName("GTiff")
-    tif = driver.Create(path, rst['ncols'], rst['nrows'], 1, prcsn)
+    tif = driver.Create(path, rst['ncols'], rst['nrows'], 1, prcsn, options)
 
     # It sets the metadata, band data and finishes
     tif.SetGeoTransform((rst['xll'], rst['clsz'], 0.0, rst['yur'], 0.0,
                          -rst['clsz']))
     band = tif.GetRasterBand(1)
     band.SetNoDataValue(rst['nodt'])
-    band.WriteArray(rst['mtrx'], 0, 0)
+    band.WriteArray(np.ma.filled(rst['mtrx'], rst['nodt']), 0, 0)
     band.FlushCache()
     tif = None
     band = None
 
 
-def write_raster(path, rst, prcsn=gdal.GDT_Float32):
+def write_raster(path, rst, prcsn=gdal.GDT_Float32, dcmls=None, compress=None, tiled=False):
     u"""
     It writes a raster after identifiying the file extension
 
@@ -213,13 +723,21 @@ def write_raster(path, rst, prcsn=gdal.GDT_Float32):
             - clsz  : Cell size
             - nodt  : Missing data value
             - mtrx  : Data matrix
+    prcsn : optional, integer
+        GeoTiff data precision, see write_tif_raster
+    dcmls : optional, integer
+        Arc/ASCII number of decimals, see write_ascii_raster
+    compress : optional, text
+        GeoTiff compression algorithm, see write_tif_raster
+    tiled : optional, boolean
+        GeoTiff tiling, see write_tif_raster
     """
     # It identifies the file extension and writes the raster
     ext = path.lower().split('.')[-1]
     if ext == 'asc':
-        rst = write_ascii_raster(path, rst)
+        rst = write_ascii_raster(path, rst, dcmls)
     elif ext in ['tif', 'tiff']:
-        rst = write_tif_raster(path, rst, prcsn)
+        rst = write_tif_raster(path, rst, prcsn, compress, tiled)
     else:
         print('File format not recognized')
 
@@ -238,3 +756,81 @@ def nulls_in_bounds(rst):
     rst['mtrx'][rst['nrows'] - 1, :] = rst['nodt']
     rst['mtrx'][:, 0] = rst['nodt']
     rst['mtrx'][:, rst['ncols'] - 1] = rst['nodt']
+
+
+# =============================================================================
+# Motor de lectura
+# =============================================================================
+
+__READERS = {}
+__DATASETS = OrderedDict()
+__DATASETS_LOCK = threading.Lock()
+__MAX_DATASETS = 16
+
+
+def register_reader(extensions, reader):
+    u"""
+    It registers the function used to read the rasters with the given file
+    extensions. The reader is called as
+    reader(path, window, bbox, missing, dtype, masked) and returns a Raster
+    dictionary
+
+    Parameters
+    ----------
+    extensions : list
+        File extensions without the dot
+    reader : function
+        Raster reader
+    """
+    for ext in extensions:
+        __READERS[ext.lower()] = reader
+
+
+def get_reader(path):
+    u"""
+    It returns the reader registered for the file extension of path, or None
+    """
+    return __READERS.get(path.lower().split('.')[-1])
+
+
+def open_dataset(path):
+    u"""
+    It opens a raster with GDAL, reusing the handle of the same file while it
+    is not modified. Virtual (/vsimem/, /vsizip/) paths are always reopened
+
+    Parameters
+    ----------
+    path : text
+        Raster file direction in the hard disk
+
+    Returns
+    -------
+    tif : gdal.Dataset
+        GDAL dataset of the raster
+    """
+    if not os.path.isfile(path):
+        return gdal.Open(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime, stat.st_size)
+    with __DATASETS_LOCK:
+        entry = __DATASETS.get(path)
+        if entry is not None and entry[0] == stamp:
+            __DATASETS.move_to_end(path)
+            return entry[1]
+        tif = gdal.Open(path)
+        __DATASETS[path] = (stamp, tif)
+        while len(__DATASETS) > __MAX_DATASETS:
+            __DATASETS.popitem(last=False)
+    return tif
+
+
+def close_datasets():
+    u"""
+    It releases every cached GDAL dataset, so their files can be removed
+    """
+    with __DATASETS_LOCK:
+        __DATASETS.clear()
+
+
+register_reader(['tif', 'tiff'], read_tif_raster_window)
+register_reader(['asc'], read_ascii_raster_window)
@@ -0,0 +1,298 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http import HTTPStatus
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from shared import folder_utils
+from shared.constants_application import DownloadDefaults, FileOpeningModes
+from shared.download_cache import DownloadCache
+
+PART_EXTENSION = ".part"
+VALIDATOR_EXTENSION = ".validator"
+
+
+class IncompleteDownloadError(IOError):
+    pass
+
+
+class DecodeError(Exception):
+    """A file was downloaded but its content could not be decoded."""
+
+
+class DownloadOptions:
+    def __init__(
+        self,
+        chunk_size: int = DownloadDefaults.CHUNK_SIZE.value,
+        timeout: int = DownloadDefaults.TIMEOUT.value,
+        retries: int = DownloadDefaults.RETRIES.value,
+        backoff: float = DownloadDefaults.BACKOFF.value
+    ):
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+
+class DownloadResult:
+    def __init__(
+        self,
+        url: str,
+        path: str = None,
+        size: int = 0,
+        elapsed: float = 0.0,
+        error: Exception = None,
+        content: bytes = None,
+        cached: bool = False,
+        checksum: str = None
+    ):
+        self.url = url
+        self.path = path
+        self.size = size
+        self.elapsed = elapsed
+        self.error = error
+        self.content = content
+        self.cached = cached
+        self.checksum = checksum
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+    @property
+    def decode_failed(self) -> bool:
+        return isinstance(self.error, DecodeError)
+
+
+def create_session(pool_size: int = DownloadDefaults.WORKERS.value) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def create_download_options(source_config) -> DownloadOptions:
+    return DownloadOptions(source_config.chunk_size, source_config.timeout, source_config.retries,
+                           source_config.backoff)
+
+
+def download_file(
+    session: requests.Session,
+    url: str,
+    path: str,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None,
+    validate=None
+) -> DownloadResult:
+    """
+    Downloads url into a .part file that is resumed with HTTP Range on retries, checked against the expected
+    size and the optional validate(path) callable, and only then atomically renamed to its final path.
+    """
+    options = options or DownloadOptions()
+    start = time.perf_counter()
+    target = cache.get_path(url) if cache else path
+    part_path = target + PART_EXTENSION
+    error = None
+    for attempt in range(options.retries + 1):
+        if attempt:
+            time.sleep(options.backoff * 2 ** (attempt - 1))
+        try:
+            fetched = __fetch_to_part(session, url, part_path, options, cache)
+            if fetched is None:
+                size = cache.copy_to(url, path)
+                return DownloadResult(url, path, size, time.perf_counter() - start, cached=True)
+            headers, size, checksum = fetched
+            if validate is not None and not validate(part_path):
+                delete_part(part_path)
+                raise IncompleteDownloadError(f"{url} failed the integrity check")
+            os.replace(part_path, target)
+            folder_utils.delete_file(part_path + VALIDATOR_EXTENSION)
+            if cache:
+                cache.store(url, headers, size, checksum)
+                cache.copy_to(url, path)
+            return DownloadResult(url, path, size, time.perf_counter() - start, checksum=checksum)
+        except (requests.RequestException, OSError) as exception:
+            error = exception
+    return DownloadResult(url, path, 0, time.perf_counter() - start, error)
+
+
+def download_files(
+    session: requests.Session,
+    jobs: list[tuple[str, str]],
+    workers: int = DownloadDefaults.WORKERS.value,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None,
+    validate=None
+) -> list[DownloadResult]:
+    """Downloads every (url, path) job sharing the session pool; a failed file does not stop the others."""
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(
+            lambda job: download_file(session, job[0], job[1], options, cache, validate), jobs))
+
+
+def download_content(
+    session: requests.Session,
+    url: str,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None
+) -> DownloadResult:
+    options = options or DownloadOptions()
+    start = time.perf_counter()
+    buffer = bytearray()
+    validator = None
+    error = None
+    for attempt in range(options.retries + 1):
+        if attempt:
+            time.sleep(options.backoff * 2 ** (attempt - 1))
+        try:
+            if not validator:
+                buffer.clear()
+            headers = build_headers(len(buffer), cache, url, validator)
+            with session.get(url, stream=True, timeout=options.timeout, headers=headers) as response:
+                if response.status_code == HTTPStatus.NOT_MODIFIED:
+                    content = cache.read(url)
+                    return DownloadResult(url, size=len(content), elapsed=time.perf_counter() - start,
+                                          content=content, cached=True)
+                response.raise_for_status()
+                if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+                    buffer.clear()
+                    validator = get_validator(response.headers)
+                offset = len(buffer)
+                for chunk in response.iter_content(chunk_size=options.chunk_size):
+                    buffer.extend(chunk)
+                check_size(url, response.headers, offset, len(buffer))
+            content = bytes(buffer)
+            if cache:
+                cache.write(url, response.headers, content)
+            return DownloadResult(url, size=len(content), elapsed=time.perf_counter() - start, content=content,
+                                  checksum=hashlib.sha256(content).hexdigest())
+        except (requests.RequestException, OSError) as exception:
+            error = exception
+    return DownloadResult(url, size=len(buffer), elapsed=time.perf_counter() - start, error=error)
+
+
+def stream_files(
+    session: requests.Session,
+    urls: list[str],
+    handler,
+    workers: int = DownloadDefaults.WORKERS.value,
+    options: DownloadOptions = None,
+    cache: DownloadCache = None
+) -> list[DownloadResult]:
+    """Downloads every url into memory and hands each buffer to handler as soon as it arrives."""
+    def fetch(url: str) -> DownloadResult:
+        result = download_content(session, url, options, cache)
+        if result.succeeded:
+            try:
+                with decoding(url):
+                    handler(result)
+            except DecodeError as error:
+                result.error = error
+            result.content = None
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        return list(executor.map(fetch, urls))
+
+
+@contextmanager
+def decoding(url: str):
+    """Re-raises any failure of the block as a DecodeError of url, so it is not taken for a download error."""
+    try:
+        yield
+    except Exception as error:
+        raise DecodeError(f"{url}: {error}") from error
+
+
+def build_headers(offset: int, cache: DownloadCache, url: str, validator: str = None) -> dict:
+    """
+    Resumes from offset only under If-Range, so a server whose file changed answers with the whole new file
+    instead of a range that would be spliced onto the old bytes.
+    """
+    if offset:
+        return {'Range': f'bytes={offset}-', 'If-Range': validator, 'Accept-Encoding': 'identity'}
+    headers = cache.get_validators(url) if cache else {}
+    headers['Accept-Encoding'] = 'identity'
+    return headers
+
+
+def get_validator(headers) -> str:
+    """Strong ETag or Last-Modified of a response, the validators If-Range accepts."""
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return headers.get('Last-Modified')
+
+
+def read_part_validator(part_path: str) -> str:
+    validator_path = part_path + VALIDATOR_EXTENSION
+    if not folder_utils.exist_folder(validator_path):
+        return None
+    with open(validator_path, encoding="utf-8") as file:
+        return file.read() or None
+
+
+def write_part_validator(part_path: str, headers) -> None:
+    validator = get_validator(headers)
+    if validator is None:
+        folder_utils.delete_file(part_path + VALIDATOR_EXTENSION)
+        return
+    with open(part_path + VALIDATOR_EXTENSION, "w", encoding="utf-8") as file:
+        file.write(validator)
+
+
+def delete_part(part_path: str) -> None:
+    folder_utils.delete_file(part_path)
+    folder_utils.delete_file(part_path + VALIDATOR_EXTENSION)
+
+
+def check_size(url: str, headers, offset: int, size: int) -> None:
+    content_range = headers.get('Content-Range', '')
+    if '/' in content_range and not content_range.endswith('*'):
+        expected = int(content_range.split('/')[-1])
+    elif 'Content-Length' in headers:
+        expected = offset + int(headers['Content-Length'])
+    else:
+        return
+    if size != expected:
+        raise IncompleteDownloadError(f"{url} downloaded {size} of {expected} bytes")
+
+
+def __fetch_to_part(session: requests.Session, url: str, part_path: str, options: DownloadOptions,
+                    cache: DownloadCache):
+    offset = os.path.getsize(part_path) if folder_utils.exist_folder(part_path) else 0
+    validator = read_part_validator(part_path) if offset else None
+    if not validator:
+        offset = 0
+    headers = build_headers(offset, cache, url, validator)
+    with session.get(url, stream=True, timeout=options.timeout, headers=headers) as response:
+        if response.status_code == HTTPStatus.NOT_MODIFIED:
+            return None
+        if response.status_code == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+            delete_part(part_path)
+            raise IncompleteDownloadError(f"{url} could not be resumed from byte {offset}")
+        response.raise_for_status()
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT:
+            offset = 0
+            write_part_validator(part_path, response.headers)
+
+        digest = hashlib.sha256()
+        size = offset
+        if offset:
+            with open(part_path, FileOpeningModes.OPEN_AND_WITHOUT_TRUNCATE.value) as f:
+                for block in iter(lambda: f.read(options.chunk_size), b''):
+                    digest.update(block)
+        mode = FileOpeningModes.OPEN_AND_APPEND if offset else FileOpeningModes.OPEN_AND_TRUNCATE
+        with open(file=part_path, mode=mode.value) as f:
+            for chunk in response.iter_content(chunk_size=options.chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+        check_size(url, response.headers, offset, size)
+        return response.headers, size, digest.hexdigest()
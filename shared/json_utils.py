@@ -6,3 +6,8 @@ from shared.constants_application import FileOpeningModes
 def parse_to_dictionary(path: str) -> dict:
     with open(path, FileOpeningModes.OPEN_FOR_READING.value, errors="ignore") as file:
         return json.load(file)
+
+
+def write_dictionary(path: str, data: dict) -> None:
+    with open(path, FileOpeningModes.OPEN_FOR_TRUNCATE_AND_WRITING.value) as file:
+        json.dump(data, file)
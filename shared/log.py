@@ -1,43 +1,39 @@
-import logging
 from dependency_injector.wiring import inject
 
 from infrastructure.model_config.model_config_service import ModelConfigService
-from shared import datetime_utils, folder_utils
-from shared.constants_application import FormatDates
+from shared import menssage
 
 
 class Log():
 
     @inject
     def __init__(self, model_config: ModelConfigService):
-        self.__log_path = model_config.get_project_config().logPath
+        self.__model_config = model_config
+        self.logger = menssage.backend.logger
         self.__configure_log()
+        model_config.on_change(self.__on_config_change)
 
-    def __configure_log(self):
-        self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
+    def __on_config_change(self, path: str) -> None:
+        if path == self.__model_config.project_path_constants.project_config_path:
+            self.__configure_log()
 
-        current_date = datetime_utils.get_current_date()
-        date_now = datetime_utils.get_str_date_formatted(
-            current_date, FormatDates.YEAR_MONTH_DAY)
+    def __configure_log(self) -> None:
+        project_config = self.__model_config.get_project_config()
+        self.__log_path = project_config.logPath
+        self.file_path = menssage.configure(self.__log_path, project_config.log_max_bytes,
+                                            project_config.log_backup_count)
 
-        path_folder = f'{self.__log_path}{date_now}'
-        folder_utils.create_folder_with_subfolders(path_folder)
-        path_machine = f'{path_folder}\\reporte_{date_now}.log'
-        file_handler = logging.FileHandler(path_machine)
-        formatter = logging.Formatter(
-            '%(asctime)s _ %(levelname)s : %(message)s')
-        file_handler.setFormatter(formatter)
-        self.logger.addHandler(file_handler)
+    def info(self, message: str, **fields) -> None:
+        menssage.info(message, **fields)
 
-    def info(self, message: str) -> None:
-        self.logger.info(message)
+    def success(self, message: str, **fields) -> None:
+        menssage.success(message, **fields)
 
-    def warning(self, message: str) -> None:
-        self.logger.warning(message)
+    def warning(self, message: str, **fields) -> None:
+        menssage.warning(message, **fields)
 
-    def error(self, message: str) -> None:
-        self.logger.error(message)
+    def error(self, message: str, **fields) -> None:
+        menssage.error(message, **fields)
 
-    def critical(self, message: str) -> None:
-        self.logger.critical(message)
+    def critical(self, message: str, **fields) -> None:
+        menssage.critical(message, **fields)
@@ -1,31 +1,155 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
 from colorama import Fore
 
-from shared import datetime_utils
-from shared.constants_application import FormatDates
+from shared import datetime_utils, folder_utils
+from shared.constants_application import FormatDates, LogDefaults
+
+LOGGER_NAME = "hydrosed"
+SUCCESS = logging.INFO + 5
+logging.addLevelName(SUCCESS, "SUCCESS")
+
+
+class RecordQueueHandler(QueueHandler):
+    """Queues the record with its message and traceback already rendered, so the fields reach the JSON log apart."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Coloured line with the hour the message was emitted; it runs in the writer thread, not in the caller."""
+    __COLOURS = {
+        SUCCESS: Fore.GREEN,
+        logging.WARNING: Fore.YELLOW,
+        logging.ERROR: Fore.RED,
+        logging.CRITICAL: Fore.RED
+    }
+
+    def format(self, record: logging.LogRecord) -> str:
+        hour = self.formatTime(record, FormatDates.HOUR_MINUTES.value)
+        text = f"{self.__COLOURS.get(record.levelno, Fore.BLUE)}{record.getMessage()}, hora: {hour}"
+        return f"{text}\n{record.exc_text}" if record.exc_text else text
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields given to the log call at the top level."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class LogBackend:
+    """
+    Log calls only put the record on a queue; a single listener thread formats it and writes it to the console
+    and, once a file is configured, to a size-rotated JSON log.
+    """
+
+    def __init__(self):
+        self.__queue = queue.SimpleQueue()
+        self.__listener: QueueListener = None
+        self.__settings: tuple = None
+        self.__lock = threading.Lock()
+        self.logger = logging.getLogger(LOGGER_NAME)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.logger.addHandler(RecordQueueHandler(self.__queue))
+
+    @property
+    def file_path(self) -> str:
+        return self.__settings[0] if self.__settings else None
+
+    def start(self, file_path: str = None, max_bytes: int = LogDefaults.MAX_BYTES.value,
+              backup_count: int = LogDefaults.BACKUP_COUNT.value) -> None:
+        """Starts the writer thread; calling it again only restarts it when the file or its rotation changes."""
+        settings = (file_path, max_bytes, backup_count)
+        with self.__lock:
+            if self.__listener is not None and (file_path is None or settings == self.__settings):
+                return
+            self.__stop_listener()
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers = [console_handler]
+            if file_path:
+                file_handler = RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count,
+                                                   encoding="utf-8")
+                file_handler.setFormatter(JsonFormatter())
+                handlers.append(file_handler)
+            self.__listener = QueueListener(self.__queue, *handlers)
+            self.__listener.start()
+            self.__settings = settings if file_path else None
+
+    def stop(self) -> None:
+        """Writes the pending records and stops the writer thread."""
+        with self.__lock:
+            self.__stop_listener()
+
+    def log(self, level: int, text: str, fields: dict) -> None:
+        if self.__listener is None:
+            self.start()
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, text, extra={"fields": fields} if fields else None)
+
+    def __stop_listener(self) -> None:
+        if self.__listener is not None:
+            self.__listener.stop()
+            for handler in self.__listener.handlers:
+                handler.close()
+            self.__listener = None
+            self.__settings = None
+
+
+backend = LogBackend()
+atexit.register(backend.stop)
 
 
-def warning(text: str) -> None:
-    print(Fore.YELLOW + __get_message_with_date_detail(text))
+def configure(log_path: str, max_bytes: int = LogDefaults.MAX_BYTES.value,
+              backup_count: int = LogDefaults.BACKUP_COUNT.value) -> str:
+    """Also writes the messages to the daily report under log_path and returns the path of the report."""
+    date_now = datetime_utils.get_str_date_formatted(datetime_utils.get_current_date(), FormatDates.YEAR_MONTH_DAY)
+    path_folder = f'{log_path}{date_now}'
+    folder_utils.create_folder_with_subfolders(path_folder)
+    file_path = folder_utils.join_path(path_folder, f'reporte_{date_now}.log')
+    backend.start(file_path, max_bytes, backup_count)
+    return file_path
 
 
-def error(text: str) -> None:
-    print(Fore.RED + __get_message_with_date_detail(text))
+def warning(text: str, **fields) -> None:
+    backend.log(logging.WARNING, text, fields)
 
 
-def success(text: str) -> None:
-    print(Fore.GREEN + __get_message_with_date_detail(text))
+def error(text: str, **fields) -> None:
+    backend.log(logging.ERROR, text, fields)
 
 
-def info(text: str) -> None:
-    print(Fore.BLUE + __get_message_with_date_detail(text))
+def success(text: str, **fields) -> None:
+    backend.log(SUCCESS, text, fields)
 
 
-def __generate_current_date() -> str:
-    current_date = datetime_utils.get_current_date()
-    date_str = datetime_utils.get_str_date_formatted(current_date, FormatDates.HOUR_MINUTES)
-    return date_str
+def info(text: str, **fields) -> None:
+    backend.log(logging.INFO, text, fields)
 
 
-def __get_message_with_date_detail(text: str) -> str:
-    date_str = __generate_current_date()
-    return f"{text}, hora: {date_str}"
+def critical(text: str, **fields) -> None:
+    backend.log(logging.CRITICAL, text, fields)
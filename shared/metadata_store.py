@@ -0,0 +1,82 @@
+import hashlib
+import os
+import tempfile
+
+import pandas as pd
+from pandas import DataFrame
+
+from shared import folder_utils
+from shared.constants_application import FileOpeningModes
+from shared.json_utils import parse_to_dictionary, write_dictionary
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), "hydrosed", "metadata")
+
+
+class MetadataStore:
+    """
+    Local Feather copies of the CSV / Excel metadata tables kept on the network share. A copy is served while its
+    source keeps the same modification time and size; when they change, the source is hashed and only re-parsed
+    if its content actually changed.
+    """
+    __TABLE_EXTENSION = ".feather"
+    __METADATA_EXTENSION = ".json"
+    __PART_EXTENSION = ".part"
+
+    def __init__(self, cache_path: str = DEFAULT_CACHE_PATH):
+        self.cache_path = cache_path
+        folder_utils.create_folder_with_subfolders(cache_path)
+
+    def read_table(self, path: str, sheet_name: str = None, columns: list = None) -> DataFrame:
+        key = self.__get_key(path, sheet_name)
+        table_path = folder_utils.join_path(self.cache_path, key + self.__TABLE_EXTENSION)
+        metadata_path = folder_utils.join_path(self.cache_path, key + self.__METADATA_EXTENSION)
+        stat = os.stat(path)
+        signature = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+        metadata = parse_to_dictionary(metadata_path) if folder_utils.exist_folder(metadata_path) else None
+        if metadata and folder_utils.exist_folder(table_path):
+            if all(metadata.get(name) == value for name, value in signature.items()):
+                return pd.read_feather(table_path, columns=columns)
+            checksum = self.__hash_file(path)
+            if metadata.get("sha256") == checksum:
+                write_dictionary(metadata_path, dict(metadata, **signature))
+                return pd.read_feather(table_path, columns=columns)
+        else:
+            checksum = self.__hash_file(path)
+
+        table = self.__parse(path, sheet_name)
+        table.to_feather(table_path + self.__PART_EXTENSION)
+        os.replace(table_path + self.__PART_EXTENSION, table_path)
+        write_dictionary(metadata_path, dict(signature, source=path, sheet_name=sheet_name, sha256=checksum))
+        return table if columns is None else table[columns]
+
+    @staticmethod
+    def __parse(path: str, sheet_name: str) -> DataFrame:
+        if path.lower().endswith(('.xls', '.xlsx', '.xlsm')):
+            table = pd.read_excel(path, sheet_name=sheet_name or 0)
+        else:
+            table = pd.read_csv(path)
+        table.columns = [str(column) for column in table.columns]
+        # Feather needs one type per column; Excel sheets often mix numbers and text, as codes like 1 and 'A2'
+        for column in table.columns[table.dtypes == object]:
+            if pd.api.types.infer_dtype(table[column], skipna=True) not in ('string', 'empty'):
+                table[column] = table[column].where(table[column].isna(), table[column].astype(str))
+        return table.reset_index(drop=True)
+
+    @staticmethod
+    def __get_key(path: str, sheet_name: str) -> str:
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = hashlib.sha1(f"{os.path.abspath(path)}|{sheet_name}".encode()).hexdigest()[:16]
+        return f"{name}_{digest}"
+
+    @staticmethod
+    def __hash_file(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, FileOpeningModes.OPEN_AND_WITHOUT_TRUNCATE.value) as file:
+            for block in iter(lambda: file.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+def create_metadata_store(source_config) -> MetadataStore:
+    return MetadataStore(source_config.metadata_cache_path or DEFAULT_CACHE_PATH)
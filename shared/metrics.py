@@ -0,0 +1,208 @@
+import bisect
+import cProfile
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from shared import folder_utils
+from shared.constants_application import FileOpeningModes
+from shared.json_utils import write_dictionary
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+RATE_BUCKETS = (1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self) -> dict:
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"count": self.count, "sum": self.sum, "buckets": cumulative}
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name and labels."""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__counters: dict[tuple, float] = {}
+        self.__histograms: dict[tuple, Histogram] = {}
+
+    def increment(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self.__lock:
+            if key not in self.__histograms:
+                self.__histograms[key] = Histogram(buckets)
+            self.__histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def to_dict(self) -> dict:
+        with self.__lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value}
+                             for (name, labels), value in self.__counters.items()],
+                "histograms": [dict(name=name, labels=dict(labels), **histogram.to_dict())
+                               for (name, labels), histogram in self.__histograms.items()]
+            }
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self.__lock:
+            for (name, labels), value in sorted(self.__counters.items()):
+                lines.append(f"{name}{self.__format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self.__histograms.items()):
+                for bound, count in histogram.to_dict()["buckets"].items():
+                    le = "+Inf" if bound == "inf" else bound
+                    lines.append(f"{name}_bucket{self.__format_labels(labels + (('le', le),))} {count}")
+                lines.append(f"{name}_sum{self.__format_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{self.__format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+    def write(self, folder: str, name: str = "metrics") -> None:
+        """Writes name.json and name.prom into folder."""
+        folder_utils.create_folder_with_subfolders(folder)
+        write_dictionary(folder_utils.join_path(folder, name + ".json"), self.to_dict())
+        with open(folder_utils.join_path(folder, name + ".prom"),
+                  FileOpeningModes.OPEN_FOR_TRUNCATE_AND_WRITING.value) as file:
+            file.write(self.to_prometheus())
+
+
+class TimedCall:
+    """Picklable wrapper returning (elapsed seconds, result), so worker processes can report their own timing."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __call__(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self.function(*args, **kwargs)
+        return time.perf_counter() - start, result
+
+
+registry = MetricsRegistry()
+__thread_profiles: list = None
+__profiles_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1, **labels) -> None:
+    registry.increment(name, value, **labels)
+
+
+def observe(name: str, value: float, buckets=DEFAULT_BUCKETS, **labels) -> None:
+    registry.observe(name, value, buckets, **labels)
+
+
+def timer(name: str, **labels):
+    return registry.timer(name, **labels)
+
+
+def observe_calls(name: str, timed_results, **labels):
+    """Yields the results of TimedCall invocations, recording the elapsed time of each one."""
+    for elapsed, result in timed_results:
+        registry.observe(name, elapsed, **labels)
+        yield result
+
+
+def record_download(source: str, result) -> None:
+    status = "ok" if result.succeeded else "decode_error" if result.decode_failed else "error"
+    registry.increment("download_files_total", source=source, status=status, cached=str(result.cached).lower())
+    if result.succeeded:
+        registry.increment("download_bytes_total", result.size, source=source)
+        registry.observe("download_seconds", result.elapsed, source=source)
+        if result.elapsed > 0 and not result.cached:
+            registry.observe("download_bytes_per_second", result.size / result.elapsed, RATE_BUCKETS, source=source)
+
+
+@contextmanager
+def profile(output_path: str, cpu: bool = False, memory: bool = False, top: int = 25):
+    """
+    Optionally runs the block under cProfile and / or tracemalloc, writing profile.prof, profile.txt and
+    memory.txt into output_path. Threads that run their work inside profile_thread() are merged into the profile.
+    """
+    global __thread_profiles
+    profiler = cProfile.Profile() if cpu else None
+    if memory:
+        tracemalloc.start()
+    if profiler:
+        __thread_profiles = []
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler or memory:
+            folder_utils.create_folder_with_subfolders(output_path)
+        if profiler:
+            profiler.disable()
+            stats = pstats.Stats(profiler)
+            with __profiles_lock:
+                for thread_profiler in __thread_profiles:
+                    stats.add(thread_profiler)
+                __thread_profiles = None
+            stats.dump_stats(folder_utils.join_path(output_path, "profile.prof"))
+            with open(folder_utils.join_path(output_path, "profile.txt"),
+                      FileOpeningModes.OPEN_FOR_TRUNCATE_AND_WRITING.value) as file:
+                stats.stream = file
+                stats.sort_stats("cumulative").print_stats(top)
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(folder_utils.join_path(output_path, "memory.txt"),
+                      FileOpeningModes.OPEN_FOR_TRUNCATE_AND_WRITING.value) as file:
+                file.write(f"current={current} peak={peak}\n")
+                for stat in snapshot.statistics("lineno")[:top]:
+                    file.write(f"{stat}\n")
+
+
+@contextmanager
+def profile_thread():
+    """Profiles the calling thread while a profile() block is active, since cProfile only sees its own thread."""
+    if __thread_profiles is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with __profiles_lock:
+            if __thread_profiles is not None:
+                __thread_profiles.append(profiler)
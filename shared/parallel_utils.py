@@ -0,0 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor
+
+
+def imap_ordered(function, *iterables, processes: int = 1):
+    """Yields function over the iterables, computed in a process pool, in the input order of the items."""
+    items = list(zip(*iterables))
+    if processes <= 1 or len(items) <= 1:
+        for item in items:
+            yield function(*item)
+        return
+    with ProcessPoolExecutor(max_workers=min(processes, len(items))) as executor:
+        yield from executor.map(function, *zip(*items))
+
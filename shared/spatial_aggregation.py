@@ -0,0 +1,89 @@
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from shared.constants_application import AggregationDefaults
+
+if TYPE_CHECKING:
+    from scipy import sparse
+
+
+class SpatialAggregator:
+    """
+    Sparse (targets x points) weight matrix that turns a (time, points) forecast into a (time, targets) one with a
+    single sparse product, whatever the number of time steps.
+    """
+
+    def __init__(self, target_ids, weights: 'sparse.csr_matrix'):
+        self.target_ids = np.asarray(target_ids)
+        self.weights = weights.tocsr()
+
+    def apply(self, values: np.ndarray) -> np.ndarray:
+        """
+        Weighted mean of the points of every target; NaN (no-data) points are left out and the remaining weights
+        renormalised, so a target is only NaN when none of its points has data.
+        """
+        values = np.asarray(values)
+        missing = np.isnan(values) if np.issubdtype(values.dtype, np.floating) else None
+        if missing is None or not missing.any():
+            return np.asarray(self.weights.dot(values.T).T, dtype=values.dtype)
+        totals = self.weights.dot(np.where(missing, 0, values).T).T
+        coverage = self.weights.dot((~missing).T.astype(float)).T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.asarray(np.where(coverage > 0, totals / coverage, np.nan), dtype=values.dtype)
+
+
+def build_gauge_aggregator(
+    station_ids,
+    station_xs,
+    station_ys,
+    point_xs,
+    point_ys,
+    neighbours: int = AggregationDefaults.NEIGHBOURS.value,
+    power: float = AggregationDefaults.IDW_POWER.value
+) -> SpatialAggregator:
+    """
+    Interpolates to every station from its nearest forecast points with inverse distance weighting; one neighbour
+    is plain nearest-point assignment and a station lying on a point takes that point's value.
+    """
+    from scipy import sparse
+    from scipy.spatial import cKDTree
+
+    points = np.column_stack([np.asarray(point_xs, dtype=float), np.asarray(point_ys, dtype=float)])
+    stations = np.column_stack([np.asarray(station_xs, dtype=float), np.asarray(station_ys, dtype=float)])
+    neighbours = min(max(1, neighbours), len(points))
+    distances, columns = cKDTree(points).query(stations, k=neighbours)
+    distances = distances.reshape(len(stations), neighbours)
+    columns = columns.reshape(len(stations), neighbours)
+
+    with np.errstate(divide='ignore'):
+        weights = 1.0 / distances ** power
+    exact = distances == 0
+    has_exact = exact.any(axis=1)
+    weights[has_exact] = exact[has_exact]
+    weights /= weights.sum(axis=1, keepdims=True)
+
+    rows = np.repeat(np.arange(len(stations)), neighbours)
+    matrix = sparse.csr_matrix((weights.ravel(), (rows, columns.ravel())), shape=(len(stations), len(points)))
+    return SpatialAggregator(station_ids, matrix)
+
+
+def build_basin_aggregator(basin_ids, basin_point_ids, areas, point_ids) -> SpatialAggregator:
+    """
+    Area-weighted mean per basin; every (basin, point, area) row is the area of the basin covered by that point's
+    cell. Rows whose point is not part of the forecast are ignored and each basin is normalised by its covered area.
+    """
+    from scipy import sparse
+
+    basins, basin_rows = np.unique(np.asarray(basin_ids), return_inverse=True)
+    positions = {point_id: position for position, point_id in enumerate(np.asarray(point_ids).tolist())}
+    columns = np.array([positions.get(point_id, -1) for point_id in np.asarray(basin_point_ids).tolist()])
+    areas = np.asarray(areas, dtype=float)
+    known = columns >= 0
+
+    matrix = sparse.csr_matrix((areas[known], (basin_rows[known], columns[known])),
+                               shape=(len(basins), len(positions)))
+    totals = np.asarray(matrix.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        scale = np.where(totals > 0, 1.0 / totals, 0.0)
+    return SpatialAggregator(basins, sparse.diags(scale).dot(matrix))
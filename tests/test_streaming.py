@@ -0,0 +1,131 @@
+import datetime
+import tempfile
+import types
+import unittest
+
+import numpy as np
+
+from benchmarks import fixtures
+from infrastructure.data_source_service.chirps_service import ChirpsService
+from infrastructure.model_config.data_source_config_model import ChirpsConfig
+from infrastructure.model_config.project_config import ProjectConfig
+from shared import datetime_utils, folder_utils, geo_utils, http_utils
+from shared.constants_application import FormatDates
+
+GRID = fixtures.GridSpec("tiny", 2, 3, -75.0, 5.0, 0.05)
+ISSUE_DATE = datetime.date(2020, 1, 2)
+DAYS = 16
+
+
+class StreamingModelConfig:
+    """Stands in for ModelConfigService, with a streaming CHIRPS source served from root."""
+
+    project_path_constants = types.SimpleNamespace(path_chirps_config="Chirps-config.json")
+
+    def __init__(self, root: str, server_url: str):
+        self.root = root
+        self.server_url = server_url
+        self.listeners = []
+
+    def get_project_config(self) -> ProjectConfig:
+        return ProjectConfig([], None, None, None, folder_utils.join_path(self.root, "log"))
+
+    def on_change(self, callback) -> None:
+        self.listeners.append(callback)
+
+    def reload(self) -> None:
+        for listener in self.listeners:
+            listener(self.project_path_constants.path_chirps_config)
+
+    def get_config_chirps(self) -> ChirpsConfig:
+        output_path = folder_utils.join_path(self.root, "chirps_output")
+        folder_utils.create_folder_with_subfolders(output_path)
+        return ChirpsConfig(
+            fixtures.CHIRPS_FILES_NAME, self.server_url + "chirps/", output_path,
+            folder_utils.join_path(self.root, "stations.csv"), folder_utils.join_path(self.root, "chirps_points.csv"),
+            folder_utils.join_path(self.root, "basins.csv"), streaming=True, download_workers=4,
+            metadata_cache_path=folder_utils.join_path(self.root, "metadata"))
+
+
+def write_days(folder: str, corrupt: bool = False) -> None:
+    """Writes every CHIRPS day as an Arc/ASCII raster filled with its day number, or as bytes no reader decodes."""
+    folder_utils.create_folder_with_subfolders(folder)
+    for day in range(DAYS):
+        date = datetime_utils.add_days_to_date(ISSUE_DATE, day)
+        path = folder_utils.join_path(folder, fixtures.CHIRPS_FILES_NAME.format(
+            datetime_utils.get_str_date_formatted(date, FormatDates.YEAR_POINT_MONTH_DAY)))
+        if corrupt:
+            with open(path, "wb") as file:
+                file.write(b"not a raster")
+            continue
+        geo_utils.write_ascii_raster(path, geo_utils.build_raster(
+            GRID.xll, GRID.yll, GRID.clsz, fixtures.NODATA, np.full((GRID.nrows, GRID.ncols), day, np.float32)))
+
+
+class ChirpsStreamingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.folder = folder_utils.join_path(folder_utils.join_path(self.root, "chirps"),
+                                             datetime_utils.get_str_date_formatted(
+                                                 ISSUE_DATE, FormatDates.YEAR_MONTH_DAY_SLASH))
+        fixtures.write_points(folder_utils.join_path(self.root, "chirps_points.csv"), GRID, 4, "POINTID")
+
+    def run_service(self, reload: bool = False) -> list:
+        written = []
+        with fixtures.serve(self.root) as server_url:
+            model_config = StreamingModelConfig(self.root, server_url)
+            service = ChirpsService(model_config)
+            service.set_issue_date(ISSUE_DATE)
+            # It keeps the decoded cube instead of resampling and aggregating it
+            service._ChirpsService__write_forecasts = lambda chirps_config, cube, index: written.append((cube, index))
+            service.get_data()
+            if reload:
+                model_config.reload()
+            service.process_data()
+        return written
+
+    def test_buffers_fill_the_cube_in_date_order(self):
+        write_days(self.folder)
+
+        written = self.run_service()
+
+        self.assertEqual(len(written), 1)
+        cube, _ = written[0]
+        self.assertEqual([date.date() for date in cube.dates], [datetime_utils.add_days_to_date(ISSUE_DATE, day) for day in range(DAYS)])
+        self.assertTrue(cube.filled.all())
+        for day in range(DAYS):
+            np.testing.assert_array_equal(cube.data[day], np.full(cube.data[day].shape, day, np.float32))
+
+    def test_a_reload_between_download_and_processing_keeps_the_run_index(self):
+        write_days(self.folder)
+
+        written = self.run_service(reload=True)
+
+        cube, index = written[0]
+        self.assertIsNotNone(index)
+        self.assertEqual(cube.data.shape[1:], (index.window[2], index.window[3]))
+
+    def test_undecodable_buffers_raise_a_decode_error(self):
+        write_days(self.folder, corrupt=True)
+
+        with self.assertRaises(http_utils.DecodeError):
+            self.run_service()
+
+    def test_handler_failures_are_reported_as_decode_errors(self):
+        write_days(self.folder)
+        url = fixtures.CHIRPS_FILES_NAME.format("2020.0102")
+
+        def fail(result):
+            raise ValueError("broken raster")
+
+        with fixtures.serve(self.folder) as server_url, http_utils.create_session(1) as session:
+            result, = http_utils.stream_files(session, [server_url + url], fail, 1)
+
+        self.assertFalse(result.succeeded)
+        self.assertTrue(result.decode_failed)
+        self.assertIsInstance(result.error.__cause__, ValueError)
+
+
+if __name__ == '__main__':
+    unittest.main()
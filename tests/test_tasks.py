@@ -0,0 +1,78 @@
+import datetime
+import tempfile
+import unittest
+
+import numpy as np
+from dependency_injector import providers
+
+from hydrosed import tasks
+from infrastructure.data_source_service.data_source_service import ExternalDataSourceService
+from infrastructure.model_config.project_config import ProjectConfig
+from shared import folder_utils, geo_utils
+
+
+class FakeModelConfig:
+    def __init__(self, root: str):
+        self.root = root
+
+    def get_project_config(self) -> ProjectConfig:
+        return ProjectConfig([], None, None, None, self.root)
+
+
+class FakeService(ExternalDataSourceService):
+    """Writes three 2x3 Arc/ASCII days to a folder of the issue date and keeps what process_matrices receives."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.processed = []
+        self.set_issue_date()
+
+    def get_data(self):
+        folder_utils.create_folder_with_subfolders(self.__get_folder_path())
+        for day in range(3):
+            geo_utils.write_ascii_raster(folder_utils.join_path(self.__get_folder_path(), f"day{day}.asc"), {
+                'mtrx': np.full((2, 3), day, dtype=np.float32), 'ncols': 3, 'nrows': 2, 'xll': 0.0, 'yll': 0.0,
+                'clsz': 1.0, 'nodt': -9999.0})
+
+    def process_data(self):
+        raise AssertionError("process_data must be split in decode tasks")
+
+    def get_decode_jobs(self) -> list:
+        names = sorted(folder_utils.list_dir(self.__get_folder_path()))
+        return [(name, folder_utils.join_path(self.__get_folder_path(), name), (0, 0, 2, 3)) for name in names]
+
+    def process_matrices(self, jobs: list, matrices) -> None:
+        self.processed.append((self.issue_date, [name for name, _, _ in jobs], [mtrx.copy() for mtrx in matrices]))
+
+    def __get_folder_path(self) -> str:
+        return folder_utils.join_path(self.root, self.issue_date.isoformat())
+
+
+class EagerPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.service = FakeService(self.root)
+        container = tasks.get_container()
+        container.model_config.override(providers.Object(FakeModelConfig(self.root)))
+        container.chirps_service.override(providers.Object(self.service))
+        self.addCleanup(container.model_config.reset_override)
+        self.addCleanup(container.chirps_service.reset_override)
+
+    def test_pipeline_runs_eagerly_with_json(self):
+        self.assertTrue(tasks.app.conf.task_always_eager)
+        self.assertEqual(tasks.app.conf.task_serializer, "json")
+
+        issue_date = datetime.date(2020, 1, 2)
+        tasks.build_pipeline(["chirps"], issue_date).apply_async().get()
+
+        self.assertEqual(len(self.service.processed), 1)
+        processed_date, names, matrices = self.service.processed[0]
+        self.assertEqual(processed_date, issue_date)
+        self.assertEqual(names, ["day0.asc", "day1.asc", "day2.asc"])
+        for day, mtrx in enumerate(matrices):
+            np.testing.assert_array_equal(mtrx, np.full((2, 3), day, dtype=np.float32))
+
+
+if __name__ == '__main__':
+    unittest.main()